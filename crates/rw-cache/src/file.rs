@@ -1,26 +1,67 @@
 //! File-based cache implementation.
 //!
 //! [`FileCache`] stores cache entries as files on disk, organized into buckets
-//! (subdirectories). Each entry is a single file with a binary header followed
-//! by the data:
+//! (subdirectories). Keys are hashed onto a flat, git-style two-level layout so
+//! that directory fanout stays bounded regardless of how deeply nested the keys
+//! are. Each entry is a single file with a binary header followed by the data:
 //!
 //! ```text
 //! [etag_len: u32 LE][etag bytes][data bytes]
 //! ```
 //!
+//! Values of at least 4 KiB (rendered pages, SVG diagrams) are stored
+//! zstd-compressed when that makes them smaller; the high bit of `etag_len`
+//! marks such entries. Small values are written as-is, since compressing them
+//! costs more than the bytes it saves.
+//!
 //! On read, only the header is read first to validate the etag. The full data
 //! is read only on cache hit, avoiding unnecessary I/O on mismatch.
 //!
+//! Writes go to a temporary file in the entry's shard directory and are then
+//! renamed into place, so concurrent readers (e.g. `rw serve` and `rw build`
+//! sharing a cache) see either the previous entry or the complete new one,
+//! never a torn write. No `fsync` is issued: losing a recent entry on power
+//! failure only costs a re-render.
+//!
 //! On construction, [`FileCache`] validates a `VERSION` file in the cache root.
 //! If the version mismatches or is missing, the entire cache directory is wiped
 //! and recreated. This ensures stale caches from previous builds are never used.
 
+use std::cell::RefCell;
 use std::fs::{self, File};
-use std::io::Read;
+use std::io::{ErrorKind, Read, Seek, SeekFrom, Write};
 use std::path::{Path, PathBuf};
 
+use rayon::prelude::*;
+use sha2::{Digest, Sha256};
+use tempfile::NamedTempFile;
+use zstd::bulk::{Compressor, Decompressor};
+use zstd::zstd_safe;
+
 use crate::{Cache, CacheBucket};
 
+/// Upper bound on a stored etag, guarding against corrupted headers that
+/// would otherwise cause huge allocations.
+const MAX_ETAG_LEN: u32 = 8192;
+
+/// Header bit marking a zstd-compressed value. Never set by a valid etag
+/// length, which is bounded by [`MAX_ETAG_LEN`].
+const COMPRESSED_FLAG: u32 = 1 << 31;
+
+/// Upper bound on a decompressed value, guarding against corrupted frame
+/// headers that would otherwise cause huge allocations.
+const MAX_VALUE_LEN: usize = 256 * 1024 * 1024;
+
+/// Values shorter than this are stored uncompressed.
+const COMPRESS_MIN_LEN: usize = 4096;
+
+/// zstd level: fast enough that writing compressed beats writing raw bytes.
+const ZSTD_LEVEL: i32 = 3;
+
+/// Batches smaller than this are written on the calling thread; handing
+/// them to the rayon pool costs more than it overlaps.
+const PARALLEL_SET_MIN: usize = 8;
+
 /// File-based [`Cache`] rooted at a directory on disk.
 ///
 /// Directory layout:
@@ -28,7 +69,8 @@ use crate::{Cache, CacheBucket};
 /// {root}/
 /// +-- VERSION            # contains the cache version string
 /// +-- pages/             # bucket "pages"
-/// |   +-- my-page        # cache entry
+/// |   +-- 3f/            # first two hex digits of sha256(key)
+/// |       +-- a1...e9.cache  # remaining hex digits, one file per entry
 /// +-- diagrams/          # bucket "diagrams"
 ///     +-- ...
 /// ```
@@ -65,70 +107,192 @@ struct FileCacheBucket {
 impl FileCacheBucket {
     /// Build the file path for a cache key.
     ///
-    /// Appends `.cache` to every key so that the empty key (`""`) maps to
-    /// `.cache` instead of the bucket directory itself (`PathBuf::join("")`
-    /// returns the original path). The extension also prevents collisions
-    /// between keys like `""` and `"_index"`.
+    /// The key is hashed with SHA-256 and split git-style into a two-digit
+    /// shard directory and a file name, so nested keys like `docs/guide/intro`
+    /// never mirror their structure on disk and every bucket has at most 256
+    /// subdirectories. Hashing also gives the empty key (`""`) its own file
+    /// instead of mapping to the bucket directory itself.
+    ///
+    /// Called on every `get` and `set`, so the hex digest is encoded on the
+    /// stack and the path is assembled in one pre-sized buffer.
     fn key_path(&self, key: &str) -> PathBuf {
-        let mut filename = key.to_owned();
-        filename.push_str(".cache");
-        self.dir.join(filename)
+        let mut hex_buf = [0u8; 64];
+        // Cannot fail: a SHA-256 digest hex-encodes to exactly 64 bytes
+        let _ = hex::encode_to_slice(Sha256::digest(key.as_bytes()), &mut hex_buf);
+        let (shard, rest) = hex_buf.split_at(2);
+
+        // Room for two separators and the ".cache" extension
+        let mut path = PathBuf::with_capacity(self.dir.as_os_str().len() + hex_buf.len() + 8);
+        path.push(&self.dir);
+        path.push(str::from_utf8(shard).unwrap_or_default());
+        path.push(str::from_utf8(rest).unwrap_or_default());
+        path.set_extension("cache");
+        path
     }
-}
 
-impl CacheBucket for FileCacheBucket {
-    fn get(&self, key: &str, etag: &str) -> Option<Vec<u8>> {
+    /// Frame and atomically publish one entry, using `buf` as scratch space.
+    ///
+    /// Batch writes pass the same `buf` for a run of entries so the frame
+    /// buffer is allocated once per run rather than once per entry.
+    fn write_entry(&self, key: &str, etag: &str, value: &[u8], buf: &mut Vec<u8>) {
         let path = self.key_path(key);
-        let mut file = File::open(&path).ok()?;
 
-        // Read etag length (u32 LE)
-        let mut len_buf = [0u8; 4];
-        file.read_exact(&mut len_buf).ok()?;
-        let etag_len = u32::from_le_bytes(len_buf) as usize;
+        // Silently ignore errors — cache is optional
+        let Some(parent) = path.parent() else {
+            return;
+        };
 
-        // Guard against corrupted files that could cause huge allocations
-        if etag_len > 8192 {
-            return None;
-        }
+        let etag_bytes = etag.as_bytes();
+        let etag_len: u32 = match etag_bytes.len().try_into() {
+            Ok(len) if len <= MAX_ETAG_LEN => len,
+            _ => return,
+        };
+        // Keep the raw bytes when compression doesn't shrink the value (e.g.
+        // already-compressed PNG data URIs)
+        let compressed = (value.len() >= COMPRESS_MIN_LEN)
+            .then(|| compress(value))
+            .flatten()
+            .filter(|data| data.len() < value.len());
+        let (header, data) = match &compressed {
+            Some(data) => (etag_len | COMPRESSED_FLAG, data.as_slice()),
+            None => (etag_len, value),
+        };
 
-        // Read stored etag
-        let mut stored_etag = vec![0u8; etag_len];
-        file.read_exact(&mut stored_etag).ok()?;
+        buf.clear();
+        buf.reserve(4 + etag_bytes.len() + data.len());
+        buf.extend_from_slice(&header.to_le_bytes());
+        buf.extend_from_slice(etag_bytes);
+        buf.extend_from_slice(data);
 
-        // Validate etag (skip if caller passes empty etag)
-        if !etag.is_empty() && stored_etag != etag.as_bytes() {
-            return None;
+        // Publish atomically: write a sibling temp file, then rename it over
+        // the final path. The temp file is removed on drop if anything fails.
+        let Some(mut tmp) = create_temp_in(parent) else {
+            return;
+        };
+        if tmp.write_all(buf).is_err() {
+            return;
         }
+        let _ = tmp.persist(&path);
+    }
+}
+
+impl CacheBucket for FileCacheBucket {
+    fn get(&self, key: &str, etag: &str) -> Option<Vec<u8>> {
+        let path = self.key_path(key);
+        let mut file = File::open(&path).ok()?;
+
+        // Read the header: etag length (u32 LE) with the compression flag,
+        // followed by the etag itself
+        let compressed = if etag.is_empty() {
+            // Skip validation: read the length, then seek past the stored etag
+            let mut len_buf = [0u8; 4];
+            file.read_exact(&mut len_buf).ok()?;
+            let header = u32::from_le_bytes(len_buf);
+            let etag_len = header & !COMPRESSED_FLAG;
+
+            // Guard against corrupted files pointing far past the header
+            if etag_len > MAX_ETAG_LEN {
+                return None;
+            }
+            file.seek(SeekFrom::Current(i64::from(etag_len))).ok()?;
+            header & COMPRESSED_FLAG != 0
+        } else {
+            // Read exactly as many bytes as a matching header would occupy in
+            // one call, so a stale entry is rejected without a second read or
+            // an allocation sized by untrusted file contents
+            let expected_len = u32::try_from(etag.len())
+                .ok()
+                .filter(|&len| len <= MAX_ETAG_LEN)?;
+            let mut header_buf = vec![0u8; 4 + etag.len()];
+            file.read_exact(&mut header_buf).ok()?;
+            let (len_buf, stored_etag) = header_buf.split_at(4);
+            let header = u32::from_le_bytes(len_buf.try_into().ok()?);
+            if header & !COMPRESSED_FLAG != expected_len || stored_etag != etag.as_bytes() {
+                return None;
+            }
+            header & COMPRESSED_FLAG != 0
+        };
 
         // Etag matches — read the remaining data (can't use fs::read, file is mid-stream)
         let mut data = Vec::new();
         #[allow(clippy::verbose_file_reads)]
         file.read_to_end(&mut data).ok()?;
+        if compressed {
+            return decompress(&data);
+        }
         Some(data)
     }
 
     fn set(&self, key: &str, etag: &str, value: &[u8]) {
-        let path = self.key_path(key);
+        self.write_entry(key, etag, value, &mut Vec::new());
+    }
 
-        // Silently ignore errors — cache is optional
-        let Some(parent) = path.parent() else {
-            return;
-        };
-        if fs::create_dir_all(parent).is_err() {
+    fn set_many(&self, entries: &[(&str, &str, &[u8])]) {
+        if entries.len() < PARALLEL_SET_MIN {
+            let mut buf = Vec::new();
+            for &(key, etag, value) in entries {
+                self.write_entry(key, etag, value, &mut buf);
+            }
             return;
         }
 
-        let etag_bytes = etag.as_bytes();
-        let etag_len: u32 = match etag_bytes.len().try_into() {
-            Ok(len) => len,
-            Err(_) => return,
-        };
-        let mut buf = Vec::with_capacity(4 + etag_bytes.len() + value.len());
-        buf.extend_from_slice(&etag_len.to_le_bytes());
-        buf.extend_from_slice(etag_bytes);
-        buf.extend_from_slice(value);
+        // Every entry lands in its own file, so the writes need no
+        // coordination beyond the directory updates the filesystem already
+        // serializes. The global rayon pool outlives the batch, so its
+        // workers keep their zstd contexts from one batch to the next.
+        entries
+            .par_iter()
+            .for_each_init(Vec::new, |buf, &(key, etag, value)| {
+                self.write_entry(key, etag, value, buf);
+            });
+    }
+}
 
-        let _ = fs::write(&path, &buf);
+thread_local! {
+    /// Per-thread zstd contexts, reused across entries: creating one allocates
+    /// and initializes several hundred KiB of state, which would otherwise be
+    /// paid on every compressed read and write.
+    static COMPRESSOR: RefCell<Option<Compressor<'static>>> = const { RefCell::new(None) };
+    static DECOMPRESSOR: RefCell<Option<Decompressor<'static>>> = const { RefCell::new(None) };
+}
+
+/// Compress `value` with this thread's shared zstd context.
+fn compress(value: &[u8]) -> Option<Vec<u8>> {
+    COMPRESSOR.with_borrow_mut(|slot| {
+        if slot.is_none() {
+            *slot = Some(Compressor::new(ZSTD_LEVEL).ok()?);
+        }
+        slot.as_mut()?.compress(value).ok()
+    })
+}
+
+/// Decompress a value written by [`compress`], sizing the output from the
+/// frame header so it is allocated exactly once.
+fn decompress(data: &[u8]) -> Option<Vec<u8>> {
+    let size = zstd_safe::get_frame_content_size(data).ok()??;
+    let capacity = usize::try_from(size)
+        .ok()
+        .filter(|&len| len <= MAX_VALUE_LEN)?;
+    DECOMPRESSOR.with_borrow_mut(|slot| {
+        if slot.is_none() {
+            *slot = Some(Decompressor::new().ok()?);
+        }
+        slot.as_mut()?.decompress(data, capacity).ok()
+    })
+}
+
+/// Create a temp file in `dir`, creating the directory only when missing.
+///
+/// Shard directories exist for all but the first write into them, so trying
+/// the file first skips the `create_dir_all` stat walk on the hot path.
+fn create_temp_in(dir: &Path) -> Option<NamedTempFile> {
+    match NamedTempFile::new_in(dir) {
+        Ok(tmp) => Some(tmp),
+        Err(e) if e.kind() == ErrorKind::NotFound => {
+            fs::create_dir_all(dir).ok()?;
+            NamedTempFile::new_in(dir).ok()
+        }
+        Err(_) => None,
     }
 }
 
@@ -153,9 +317,10 @@ fn validate_version(root: &Path, version: &str) {
         }
     }
 
-    // Wipe and recreate
-    if root.exists()
-        && let Err(e) = fs::remove_dir_all(root)
+    // Wipe and recreate (a missing root is the common first-run case, so
+    // try the removal instead of probing for it first)
+    if let Err(e) = fs::remove_dir_all(root)
+        && e.kind() != ErrorKind::NotFound
     {
         tracing::warn!("failed to remove cache directory: {e}");
     }
@@ -199,6 +364,19 @@ mod tests {
         assert_eq!(bucket.get("key", "wrong-etag"), None);
     }
 
+    #[test]
+    fn test_file_bucket_etag_prefix_does_not_match() {
+        let tmp = TempDir::new().unwrap();
+        let cache = FileCache::new(tmp.path().join("cache"), "v1");
+        let bucket = cache.bucket("pages");
+
+        // The stored etag followed by the data spells out the requested etag
+        bucket.set("key", "abc", b"def-data");
+
+        assert_eq!(bucket.get("key", "abcdef"), None);
+        assert_eq!(bucket.get("key", "ab"), None);
+    }
+
     #[test]
     fn test_file_bucket_empty_etag_skips_validation() {
         let tmp = TempDir::new().unwrap();
@@ -263,6 +441,29 @@ mod tests {
         );
     }
 
+    #[test]
+    fn test_file_bucket_nested_key_uses_flat_layout() {
+        let tmp = TempDir::new().unwrap();
+        let root = tmp.path().join("cache");
+        let cache = FileCache::new(root.clone(), "v1");
+        let bucket = cache.bucket("pages");
+
+        bucket.set("docs/guide/intro", "etag1", b"nested content");
+
+        // Key structure is not mirrored on disk
+        assert!(!root.join("pages/docs").exists());
+
+        // Entry lives at pages/{2 hex}/{62 hex}.cache
+        let shards: Vec<_> = fs::read_dir(root.join("pages")).unwrap().collect();
+        assert_eq!(shards.len(), 1);
+        let shard = shards[0].as_ref().unwrap().path();
+        assert_eq!(shard.file_name().unwrap().len(), 2);
+        let entries: Vec<_> = fs::read_dir(&shard).unwrap().collect();
+        assert_eq!(entries.len(), 1);
+        let name = entries[0].as_ref().unwrap().file_name();
+        assert_eq!(name.len(), 62 + ".cache".len());
+    }
+
     #[test]
     fn test_file_bucket_empty_key() {
         let tmp = TempDir::new().unwrap();
@@ -280,6 +481,91 @@ mod tests {
         assert_eq!(bucket.get("_index", "etag1"), Some(b"_index page".to_vec()));
     }
 
+    #[test]
+    fn test_file_bucket_set_leaves_no_temp_files() {
+        let tmp = TempDir::new().unwrap();
+        let root = tmp.path().join("cache");
+        let cache = FileCache::new(root.clone(), "v1");
+        let bucket = cache.bucket("pages");
+
+        bucket.set("key", "etag1", b"first");
+        bucket.set("key", "etag2", b"second");
+
+        let shard = fs::read_dir(root.join("pages"))
+            .unwrap()
+            .next()
+            .unwrap()
+            .unwrap()
+            .path();
+        let names: Vec<_> = fs::read_dir(shard)
+            .unwrap()
+            .map(|entry| entry.unwrap().file_name())
+            .collect();
+        assert_eq!(names.len(), 1);
+        assert!(names[0].to_string_lossy().ends_with(".cache"));
+    }
+
+    #[test]
+    fn test_file_bucket_set_recreates_removed_bucket_dir() {
+        let tmp = TempDir::new().unwrap();
+        let root = tmp.path().join("cache");
+        let cache = FileCache::new(root.clone(), "v1");
+        let bucket = cache.bucket("pages");
+
+        bucket.set("key", "etag1", b"first");
+        fs::remove_dir_all(root.join("pages")).unwrap();
+
+        bucket.set("key", "etag1", b"second");
+        assert_eq!(bucket.get("key", "etag1"), Some(b"second".to_vec()));
+    }
+
+    #[test]
+    fn test_file_bucket_compresses_large_values() {
+        let tmp = TempDir::new().unwrap();
+        let bucket = FileCacheBucket {
+            dir: tmp.path().join("pages"),
+        };
+        let html = "<p>Repetitive markup compresses well.</p>\n".repeat(500);
+
+        bucket.set("page", "etag1", html.as_bytes());
+
+        let on_disk = fs::metadata(bucket.key_path("page")).unwrap().len();
+        assert!(on_disk < html.len() as u64 / 4);
+        assert_eq!(bucket.get("page", "etag1"), Some(html.into_bytes()));
+        assert_eq!(bucket.get("page", "etag2"), None);
+    }
+
+    #[test]
+    fn test_file_bucket_stores_small_values_uncompressed() {
+        let tmp = TempDir::new().unwrap();
+        let bucket = FileCacheBucket {
+            dir: tmp.path().join("pages"),
+        };
+
+        bucket.set("page", "etag1", b"<p>Test</p>");
+
+        let raw = fs::read(bucket.key_path("page")).unwrap();
+        assert!(raw.ends_with(b"<p>Test</p>"));
+    }
+
+    #[test]
+    fn test_file_bucket_set_many() {
+        let tmp = TempDir::new().unwrap();
+        let cache = FileCache::new(tmp.path().join("cache"), "v1");
+        let bucket = cache.bucket("diagrams");
+
+        let keys: Vec<String> = (0..50).map(|i| format!("diagram-{i}")).collect();
+        let entries: Vec<(&str, &str, &[u8])> = keys
+            .iter()
+            .map(|key| (key.as_str(), "etag1", key.as_bytes()))
+            .collect();
+        bucket.set_many(&entries);
+
+        for key in &keys {
+            assert_eq!(bucket.get(key, "etag1"), Some(key.as_bytes().to_vec()));
+        }
+    }
+
     #[test]
     fn test_file_bucket_binary_data() {
         let tmp = TempDir::new().unwrap();
@@ -357,7 +643,10 @@ mod tests {
         bucket.set("key", "etag1", b"data");
 
         // Overwrite the cache file with a corrupted etag length (u32::MAX)
-        let path = tmp.path().join("cache/pages/key.cache");
+        let path = FileCacheBucket {
+            dir: tmp.path().join("cache/pages"),
+        }
+        .key_path("key");
         let mut corrupt = Vec::new();
         corrupt.extend_from_slice(&u32::MAX.to_le_bytes());
         corrupt.extend_from_slice(b"garbage");
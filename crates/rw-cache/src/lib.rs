@@ -10,6 +10,7 @@
 //!
 //! - [`NullCache`]: No-op implementation (always miss)
 //! - [`FileCache`]: File-based implementation with version validation
+//! - [`MemoryCache`]: In-memory layer of recently used entries over another cache
 //!
 //! # Example
 //!
@@ -24,9 +25,11 @@
 
 mod ext;
 mod file;
+mod memory;
 
 pub use ext::CacheBucketExt;
 pub use file::FileCache;
+pub use memory::{MemoryBudget, MemoryCache};
 
 /// A named partition within a [`Cache`].
 ///
@@ -60,6 +63,18 @@ pub trait CacheBucket: Send + Sync {
     /// * `etag` - Etag to associate with this entry
     /// * `value` - Raw bytes to cache
     fn set(&self, key: &str, etag: &str, value: &[u8]);
+
+    /// Store several values at once.
+    ///
+    /// Equivalent to calling [`set`](Self::set) for each `(key, etag, value)`
+    /// entry, but lets implementations overlap the writes. Entries with the
+    /// same key are written in an unspecified order. The default
+    /// implementation stores them one after another.
+    fn set_many(&self, entries: &[(&str, &str, &[u8])]) {
+        for &(key, etag, value) in entries {
+            self.set(key, etag, value);
+        }
+    }
 }
 
 /// Factory for named cache [`CacheBucket`]s.
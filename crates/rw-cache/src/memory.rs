@@ -0,0 +1,572 @@
+//! In-memory cache layer.
+//!
+//! [`MemoryCache`] wraps another [`Cache`] and keeps recently used entries in
+//! process memory, so repeated lookups of the same key (a page reloaded in
+//! `rw serve`, a diagram shared by several pages) skip the underlying storage:
+//! no file open, no read, no decompression.
+//!
+//! Writes go through to the inner cache and update the memory layer. All
+//! buckets share one byte budget; an insert that would exceed it evicts the
+//! least recently used entries first, whichever bucket they belong to. Caches
+//! built with [`MemoryCache::with_budget`] share one [`MemoryBudget`] the same
+//! way, while each keeps its own entries.
+//!
+//! A lookup with an empty etag is answered from memory when the key is held
+//! there, even if another process has since replaced the entry on disk. Etag
+//! lookups are unaffected: a held entry answers only the etag it was stored
+//! with, and an entry first read with an empty etag, whose etag is therefore
+//! unknown, answers only empty-etag lookups.
+
+use std::collections::HashMap;
+use std::sync::Arc;
+
+use parking_lot::Mutex;
+
+use crate::{Cache, CacheBucket};
+
+/// [`Cache`] that keeps recently used entries in memory in front of another
+/// cache.
+///
+/// The byte budget covers every bucket together, so a process holds at most
+/// `max_bytes` of cached entries however many buckets it opens. Bucket handles
+/// with the same name share entries, so an entry written through one handle is
+/// served from memory through any other.
+///
+/// # Example
+///
+/// ```
+/// use rw_cache::{Cache, MemoryCache, NullCache};
+///
+/// let cache = MemoryCache::new(NullCache, 1024 * 1024);
+/// let bucket = cache.bucket("pages");
+/// bucket.set("my-page", "v1", b"<html>hello</html>");
+/// assert_eq!(bucket.get("my-page", "v1").as_deref(), Some(&b"<html>hello</html>"[..]));
+/// ```
+pub struct MemoryCache {
+    inner: Box<dyn Cache>,
+    lru: Arc<Mutex<Lru>>,
+    /// This cache's id in `lru`, keeping its buckets apart from those of other
+    /// caches on the same budget.
+    id: usize,
+}
+
+impl MemoryCache {
+    /// Budget the `rw` front ends (`rw serve`, the napi site) hold in memory:
+    /// 64 MiB across all buckets.
+    pub const DEFAULT_MAX_BYTES: usize = 64 * 1024 * 1024;
+
+    /// Wrap `inner`, keeping up to `max_bytes` of entries in memory across all
+    /// buckets.
+    ///
+    /// An entry's size is its key, etag and value lengths. Entries larger than
+    /// `max_bytes` are never held in memory; they are still written to and
+    /// read from `inner`.
+    #[must_use]
+    pub fn new(inner: impl Cache + 'static, max_bytes: usize) -> Self {
+        Self::with_budget(inner, &MemoryBudget::new(max_bytes))
+    }
+
+    /// Wrap `inner`, holding its entries under `budget` together with those of
+    /// every other cache built on it.
+    ///
+    /// Entries are not shared between the caches: a key written through one
+    /// is not served from memory by another, even in a bucket of the same
+    /// name.
+    #[must_use]
+    pub fn with_budget(inner: impl Cache + 'static, budget: &MemoryBudget) -> Self {
+        let id = budget.lru.lock().cache_id();
+        Self {
+            inner: Box::new(inner),
+            lru: Arc::clone(&budget.lru),
+            id,
+        }
+    }
+}
+
+impl Cache for MemoryCache {
+    fn bucket(&self, name: &str) -> Box<dyn CacheBucket> {
+        let bucket = self.lru.lock().bucket_id(self.id, name);
+        Box::new(MemoryCacheBucket {
+            inner: self.inner.bucket(name),
+            lru: Arc::clone(&self.lru),
+            bucket,
+        })
+    }
+}
+
+/// Byte budget shared by the [`MemoryCache`]s built on it with
+/// [`MemoryCache::with_budget`].
+///
+/// A process serving several sites holds at most `max_bytes` in memory however
+/// many sites it opens; the least recently used entry is evicted first,
+/// whichever cache it belongs to.
+#[derive(Clone)]
+pub struct MemoryBudget {
+    lru: Arc<Mutex<Lru>>,
+}
+
+impl MemoryBudget {
+    /// Budget of `max_bytes`, measured as for [`MemoryCache::new`].
+    #[must_use]
+    pub fn new(max_bytes: usize) -> Self {
+        Self {
+            lru: Arc::new(Mutex::new(Lru::new(max_bytes))),
+        }
+    }
+}
+
+/// A bucket of [`MemoryCache`]: the shared memory layer over an inner bucket.
+struct MemoryCacheBucket {
+    inner: Box<dyn CacheBucket>,
+    lru: Arc<Mutex<Lru>>,
+    /// This bucket's id in `lru`.
+    bucket: usize,
+}
+
+impl CacheBucket for MemoryCacheBucket {
+    fn get(&self, key: &str, etag: &str) -> Option<Vec<u8>> {
+        // Bind the hit first so the lock is released before the copy
+        let held = self.lru.lock().get(self.bucket, key, etag);
+        if let Some(value) = held {
+            return Some(value.to_vec());
+        }
+        let value = self.inner.get(key, etag)?;
+        self.lru
+            .lock()
+            .insert(self.bucket, key, etag, Arc::from(value.as_slice()));
+        Some(value)
+    }
+
+    fn set(&self, key: &str, etag: &str, value: &[u8]) {
+        self.inner.set(key, etag, value);
+        self.lru
+            .lock()
+            .insert(self.bucket, key, etag, Arc::from(value));
+    }
+
+    fn set_many(&self, entries: &[(&str, &str, &[u8])]) {
+        self.inner.set_many(entries);
+        let values: Vec<Arc<[u8]>> = entries
+            .iter()
+            .map(|&(_, _, value)| Arc::from(value))
+            .collect();
+        let mut lru = self.lru.lock();
+        for (&(key, etag, _), value) in entries.iter().zip(values) {
+            lru.insert(self.bucket, key, etag, value);
+        }
+    }
+}
+
+/// Link value marking the end of the recency list.
+const NIL: usize = usize::MAX;
+
+/// Entries held in memory for every bucket, in a recency list threaded
+/// through a slab, so lookup, promotion, insertion and eviction are all O(1).
+struct Lru {
+    /// Number of caches built on this budget, the next cache id.
+    caches: usize,
+    /// Cache id and bucket name to the bucket id indexing `keys`.
+    bucket_ids: HashMap<(usize, String), usize>,
+    /// Per bucket id, each held key's slot in `nodes`.
+    keys: Vec<HashMap<String, usize>>,
+    /// Slab of entries; slots listed in `free` are unused.
+    nodes: Vec<Node>,
+    free: Vec<usize>,
+    /// Most recently used slot.
+    head: usize,
+    /// Least recently used slot, the next to be evicted.
+    tail: usize,
+    /// Sum of the sizes of held entries.
+    bytes: usize,
+    max_bytes: usize,
+}
+
+struct Node {
+    bucket: usize,
+    key: String,
+    /// Empty when the entry was read with an empty etag, so its etag is
+    /// unknown and it answers only empty-etag lookups.
+    etag: String,
+    /// Shared so a hit can be copied out after the lock is released.
+    value: Arc<[u8]>,
+    /// Neighbour towards `head`.
+    prev: usize,
+    /// Neighbour towards `tail`.
+    next: usize,
+}
+
+impl Node {
+    fn size(&self) -> usize {
+        self.key.len() + self.etag.len() + self.value.len()
+    }
+}
+
+impl Lru {
+    fn new(max_bytes: usize) -> Self {
+        Self {
+            caches: 0,
+            bucket_ids: HashMap::new(),
+            keys: Vec::new(),
+            nodes: Vec::new(),
+            free: Vec::new(),
+            head: NIL,
+            tail: NIL,
+            bytes: 0,
+            max_bytes,
+        }
+    }
+
+    fn cache_id(&mut self) -> usize {
+        self.caches += 1;
+        self.caches - 1
+    }
+
+    fn bucket_id(&mut self, cache: usize, name: &str) -> usize {
+        let next = self.keys.len();
+        let id = *self
+            .bucket_ids
+            .entry((cache, name.to_owned()))
+            .or_insert(next);
+        if id == next {
+            self.keys.push(HashMap::new());
+        }
+        id
+    }
+
+    fn get(&mut self, bucket: usize, key: &str, etag: &str) -> Option<Arc<[u8]>> {
+        let slot = *self.keys[bucket].get(key)?;
+        if !etag.is_empty() && self.nodes[slot].etag != etag {
+            return None;
+        }
+        self.unlink(slot);
+        self.push_front(slot);
+        Some(Arc::clone(&self.nodes[slot].value))
+    }
+
+    fn insert(&mut self, bucket: usize, key: &str, etag: &str, value: Arc<[u8]>) {
+        if let Some(slot) = self.keys[bucket].get(key).copied() {
+            self.remove(slot);
+        }
+        let size = key.len() + etag.len() + value.len();
+        if size > self.max_bytes {
+            return;
+        }
+        while self.bytes + size > self.max_bytes && self.tail != NIL {
+            self.remove(self.tail);
+        }
+
+        let node = Node {
+            bucket,
+            key: key.to_owned(),
+            etag: etag.to_owned(),
+            value,
+            prev: NIL,
+            next: NIL,
+        };
+        let slot = if let Some(slot) = self.free.pop() {
+            self.nodes[slot] = node;
+            slot
+        } else {
+            self.nodes.push(node);
+            self.nodes.len() - 1
+        };
+        self.push_front(slot);
+        self.bytes += size;
+        self.keys[bucket].insert(key.to_owned(), slot);
+    }
+
+    /// Drop the entry in `slot`, releasing its memory and freeing the slot.
+    fn remove(&mut self, slot: usize) {
+        self.unlink(slot);
+        let node = &mut self.nodes[slot];
+        self.bytes -= node.size();
+        let key = std::mem::take(&mut node.key);
+        node.etag = String::new();
+        node.value = Arc::from([]);
+        self.keys[node.bucket].remove(&key);
+        self.free.push(slot);
+    }
+
+    fn unlink(&mut self, slot: usize) {
+        let Node { prev, next, .. } = self.nodes[slot];
+        if prev == NIL {
+            self.head = next;
+        } else {
+            self.nodes[prev].next = next;
+        }
+        if next == NIL {
+            self.tail = prev;
+        } else {
+            self.nodes[next].prev = prev;
+        }
+    }
+
+    fn push_front(&mut self, slot: usize) {
+        self.nodes[slot].prev = NIL;
+        self.nodes[slot].next = self.head;
+        if self.head == NIL {
+            self.tail = slot;
+        } else {
+            self.nodes[self.head].prev = slot;
+        }
+        self.head = slot;
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use std::sync::atomic::{AtomicUsize, Ordering};
+
+    use super::*;
+
+    /// `(bucket, key)` to `(etag, value)`.
+    type Stored = HashMap<(String, String), (String, Vec<u8>)>;
+
+    /// Inner cache that stores entries and counts the `get` calls reaching it.
+    #[derive(Clone, Default)]
+    struct CountingCache {
+        entries: Arc<Mutex<Stored>>,
+        gets: Arc<AtomicUsize>,
+    }
+
+    impl Cache for CountingCache {
+        fn bucket(&self, name: &str) -> Box<dyn CacheBucket> {
+            Box::new(CountingBucket {
+                cache: self.clone(),
+                name: name.to_owned(),
+            })
+        }
+    }
+
+    struct CountingBucket {
+        cache: CountingCache,
+        name: String,
+    }
+
+    impl CacheBucket for CountingBucket {
+        fn get(&self, key: &str, etag: &str) -> Option<Vec<u8>> {
+            self.cache.gets.fetch_add(1, Ordering::SeqCst);
+            let entries = self.cache.entries.lock();
+            let (stored, value) = entries.get(&(self.name.clone(), key.to_owned()))?;
+            (etag.is_empty() || stored == etag).then(|| value.clone())
+        }
+
+        fn set(&self, key: &str, etag: &str, value: &[u8]) {
+            self.cache.entries.lock().insert(
+                (self.name.clone(), key.to_owned()),
+                (etag.to_owned(), value.to_vec()),
+            );
+        }
+    }
+
+    fn memory_cache(max_bytes: usize) -> (MemoryCache, CountingCache) {
+        let inner = CountingCache::default();
+        (MemoryCache::new(inner.clone(), max_bytes), inner)
+    }
+
+    #[test]
+    fn test_repeated_get_reads_inner_once() {
+        let (cache, inner) = memory_cache(1024);
+        inner.bucket("pages").set("key", "v1", b"value");
+        let bucket = cache.bucket("pages");
+
+        for _ in 0..3 {
+            assert_eq!(bucket.get("key", "v1"), Some(b"value".to_vec()));
+        }
+        assert_eq!(inner.gets.load(Ordering::SeqCst), 1);
+    }
+
+    #[test]
+    fn test_set_writes_through_and_serves_from_memory() {
+        let (cache, inner) = memory_cache(1024);
+        let bucket = cache.bucket("pages");
+
+        bucket.set("key", "v1", b"value");
+
+        assert_eq!(bucket.get("key", "v1"), Some(b"value".to_vec()));
+        assert_eq!(inner.gets.load(Ordering::SeqCst), 0);
+        assert_eq!(
+            inner.bucket("pages").get("key", "v1"),
+            Some(b"value".to_vec())
+        );
+    }
+
+    #[test]
+    fn test_set_many_writes_through_and_serves_from_memory() {
+        let (cache, inner) = memory_cache(1024);
+        let bucket = cache.bucket("pages");
+
+        bucket.set_many(&[("a", "v1", b"one"), ("b", "v1", b"two")]);
+
+        assert_eq!(bucket.get("a", "v1"), Some(b"one".to_vec()));
+        assert_eq!(bucket.get("b", "v1"), Some(b"two".to_vec()));
+        assert_eq!(inner.gets.load(Ordering::SeqCst), 0);
+        assert_eq!(inner.bucket("pages").get("b", "v1"), Some(b"two".to_vec()));
+    }
+
+    #[test]
+    fn test_etag_mismatch_misses() {
+        let (cache, _inner) = memory_cache(1024);
+        let bucket = cache.bucket("pages");
+
+        bucket.set("key", "v1", b"value");
+
+        assert_eq!(bucket.get("key", "v2"), None);
+    }
+
+    #[test]
+    fn test_empty_etag_skips_validation() {
+        let (cache, _inner) = memory_cache(1024);
+        let bucket = cache.bucket("pages");
+
+        bucket.set("key", "v1", b"value");
+
+        assert_eq!(bucket.get("key", ""), Some(b"value".to_vec()));
+    }
+
+    #[test]
+    fn test_repeated_empty_etag_get_reads_inner_once() {
+        let (cache, inner) = memory_cache(1024);
+        inner.bucket("diagrams").set("key", "v1", b"value");
+        let bucket = cache.bucket("diagrams");
+
+        assert_eq!(bucket.get("key", ""), Some(b"value".to_vec()));
+        assert_eq!(bucket.get("key", ""), Some(b"value".to_vec()));
+        assert_eq!(inner.gets.load(Ordering::SeqCst), 1);
+    }
+
+    #[test]
+    fn test_empty_etag_get_does_not_answer_etag_lookups() {
+        let (cache, inner) = memory_cache(1024);
+        inner.bucket("pages").set("key", "v1", b"value");
+        let bucket = cache.bucket("pages");
+
+        assert_eq!(bucket.get("key", ""), Some(b"value".to_vec()));
+        // The held entry's etag is unknown, so both lookups go to the inner cache
+        assert_eq!(bucket.get("key", "v2"), None);
+        assert_eq!(bucket.get("key", "v1"), Some(b"value".to_vec()));
+        assert_eq!(inner.gets.load(Ordering::SeqCst), 3);
+
+        // The etag read replaced the entry, which now answers "v1" from memory
+        assert_eq!(bucket.get("key", "v1"), Some(b"value".to_vec()));
+        assert_eq!(inner.gets.load(Ordering::SeqCst), 3);
+    }
+
+    #[test]
+    fn test_handles_with_same_name_share_memory() {
+        let (cache, inner) = memory_cache(1024);
+
+        cache.bucket("pages").set("key", "v1", b"value");
+
+        assert_eq!(
+            cache.bucket("pages").get("key", "v1"),
+            Some(b"value".to_vec())
+        );
+        assert_eq!(inner.gets.load(Ordering::SeqCst), 0);
+    }
+
+    #[test]
+    fn test_buckets_are_isolated() {
+        let (cache, _inner) = memory_cache(1024);
+
+        cache.bucket("pages").set("key", "v1", b"value");
+
+        assert_eq!(cache.bucket("diagrams").get("key", "v1"), None);
+    }
+
+    #[test]
+    fn test_evicts_least_recently_used() {
+        // Each entry is 7 bytes: a 1-byte key, 2-byte etag and 4-byte value
+        let (cache, inner) = memory_cache(14);
+        let bucket = cache.bucket("pages");
+
+        bucket.set("a", "v1", b"aaaa");
+        bucket.set("b", "v1", b"bbbb");
+        // Touch "a" so that "b" is the least recently used
+        assert!(bucket.get("a", "v1").is_some());
+        bucket.set("c", "v1", b"cccc");
+
+        assert!(bucket.get("a", "v1").is_some());
+        assert!(bucket.get("c", "v1").is_some());
+        assert_eq!(inner.gets.load(Ordering::SeqCst), 0);
+
+        // "b" was evicted from memory but is still in the inner cache
+        assert_eq!(bucket.get("b", "v1"), Some(b"bbbb".to_vec()));
+        assert_eq!(inner.gets.load(Ordering::SeqCst), 1);
+    }
+
+    #[test]
+    fn test_budget_is_shared_across_buckets() {
+        let (cache, inner) = memory_cache(14);
+        let pages = cache.bucket("pages");
+        let diagrams = cache.bucket("diagrams");
+
+        pages.set("a", "v1", b"aaaa");
+        diagrams.set("b", "v1", b"bbbb");
+        diagrams.set("c", "v1", b"cccc");
+
+        // The diagrams bucket evicted the page, the least recently used entry
+        assert!(diagrams.get("b", "v1").is_some());
+        assert!(diagrams.get("c", "v1").is_some());
+        assert_eq!(inner.gets.load(Ordering::SeqCst), 0);
+        assert_eq!(pages.get("a", "v1"), Some(b"aaaa".to_vec()));
+        assert_eq!(inner.gets.load(Ordering::SeqCst), 1);
+    }
+
+    #[test]
+    fn test_caches_on_one_budget_keep_their_own_entries() {
+        let budget = MemoryBudget::new(14);
+        let (first_inner, second_inner) = (CountingCache::default(), CountingCache::default());
+        let first = MemoryCache::with_budget(first_inner.clone(), &budget);
+        let second = MemoryCache::with_budget(second_inner.clone(), &budget);
+
+        first.bucket("pages").set("a", "v1", b"aaaa");
+        assert_eq!(second.bucket("pages").get("a", "v1"), None);
+        assert_eq!(second_inner.gets.load(Ordering::SeqCst), 1);
+
+        // The second cache's entries evict the first cache's, the least
+        // recently used
+        second.bucket("pages").set("b", "v1", b"bbbb");
+        second.bucket("pages").set("c", "v1", b"cccc");
+        assert_eq!(first.bucket("pages").get("a", "v1"), Some(b"aaaa".to_vec()));
+        assert_eq!(first_inner.gets.load(Ordering::SeqCst), 1);
+    }
+
+    #[test]
+    fn test_rewriting_a_key_does_not_leak_budget() {
+        let (cache, inner) = memory_cache(14);
+        let bucket = cache.bucket("pages");
+
+        for _ in 0..100 {
+            bucket.set("a", "v1", b"aaaa");
+        }
+        bucket.set("b", "v1", b"bbbb");
+
+        assert!(bucket.get("a", "v1").is_some());
+        assert!(bucket.get("b", "v1").is_some());
+        assert_eq!(inner.gets.load(Ordering::SeqCst), 0);
+    }
+
+    #[test]
+    fn test_value_larger_than_budget_is_not_held() {
+        let (cache, inner) = memory_cache(4);
+        let bucket = cache.bucket("pages");
+
+        bucket.set("key", "v1", b"too large");
+
+        assert_eq!(bucket.get("key", "v1"), Some(b"too large".to_vec()));
+        assert_eq!(inner.gets.load(Ordering::SeqCst), 1);
+    }
+
+    #[test]
+    fn test_overwrite_replaces_held_entry() {
+        let (cache, _inner) = memory_cache(1024);
+        let bucket = cache.bucket("pages");
+
+        bucket.set("key", "v1", b"old");
+        bucket.set("key", "v2", b"new");
+
+        assert_eq!(bucket.get("key", "v1"), None);
+        assert_eq!(bucket.get("key", "v2"), Some(b"new".to_vec()));
+    }
+}
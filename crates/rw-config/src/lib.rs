@@ -503,7 +503,8 @@ impl Config {
     /// react when absent. Does not validate field presence — callers must run
     /// [`Self::validate`] afterwards.
     fn resolve_paths(&mut self) {
-        let project_dir = self.project_dir.clone();
+        // Borrowed, not cloned: the resolved fields are disjoint from it
+        let project_dir = &self.project_dir;
         let resolve = |path: Option<&str>, default: &str| project_dir.join(path.unwrap_or(default));
 
         self.docs_resolved = DocsConfig {
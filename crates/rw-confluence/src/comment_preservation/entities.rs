@@ -3,9 +3,10 @@
 //! Converts named HTML entities to their Unicode equivalents for XML parsing.
 //! Standard XML entities (amp, lt, gt, quot, apos) are preserved as-is.
 
+use std::borrow::Cow;
 use std::sync::LazyLock;
 
-use regex::Regex;
+use regex::{Captures, Regex, Replacer};
 
 /// Regex pattern for matching named HTML entities.
 static ENTITY_PATTERN: LazyLock<Regex> =
@@ -15,13 +16,19 @@ static ENTITY_PATTERN: LazyLock<Regex> =
 ///
 /// Replaces named HTML entities (e.g., `&nbsp;`, `&mdash;`) with their Unicode
 /// equivalents. Standard XML entities (amp, lt, gt, quot, apos) are left unchanged.
-pub fn convert_html_entities(html: &str) -> String {
-    ENTITY_PATTERN
-        .replace_all(html, |caps: &regex::Captures| {
-            let entity_name = &caps[1];
-            entity_to_unicode(entity_name).map_or_else(|| caps[0].to_string(), String::from)
-        })
-        .into_owned()
+/// Input without named entities is returned borrowed, without a copy.
+pub fn convert_html_entities(html: &str) -> Cow<'_, str> {
+    ENTITY_PATTERN.replace_all(html, EntityReplacer)
+}
+
+/// Writes each entity's replacement straight into the output buffer, instead
+/// of allocating a `String` per entity for the regex to copy.
+struct EntityReplacer;
+
+impl Replacer for EntityReplacer {
+    fn replace_append(&mut self, caps: &Captures<'_>, dst: &mut String) {
+        dst.push_str(entity_to_unicode(&caps[1]).unwrap_or(&caps[0]));
+    }
 }
 
 /// Map HTML entity name to Unicode character.
@@ -138,4 +145,12 @@ mod tests {
     fn test_no_entities() {
         assert_eq!(convert_html_entities("Hello World"), "Hello World");
     }
+
+    #[test]
+    fn test_no_entities_is_borrowed() {
+        assert!(matches!(
+            convert_html_entities("<p>Hello World</p>"),
+            Cow::Borrowed(_)
+        ));
+    }
 }
@@ -43,51 +43,94 @@ impl<'a> TreeMatcher<'a> {
         new_children: &'a [TreeNode],
         matches: &mut HashMap<*const TreeNode, *const TreeNode>,
     ) {
-        // Filter out comment markers from old children
-        let old_content: Vec<_> = old_children
-            .iter()
-            .filter(|c| !c.is_comment_marker())
-            .collect();
+        // A signature covers a node's whole subtree, so compute each one once
+        // here rather than once per compared pair.
+        let new_signatures: Vec<String> =
+            new_children.iter().map(TreeNode::text_signature).collect();
+
+        // Unchanged content is the common case: index new children by tag and
+        // signature so an identical node is found without scoring every
+        // candidate. Indices stay in document order, so the first unmatched
+        // identical node wins, as it would in the full scan.
+        let mut identical: HashMap<(&str, &str), Vec<usize>> = HashMap::new();
+        for (idx, (new_child, signature)) in new_children.iter().zip(&new_signatures).enumerate() {
+            if !signature.is_empty() {
+                identical
+                    .entry((new_child.tag.as_str(), signature.as_str()))
+                    .or_default()
+                    .push(idx);
+            }
+        }
 
         // Track which new children have been matched
         let mut matched_new: Vec<bool> = vec![false; new_children.len()];
 
-        // For each old child, find the best matching new child
-        for old_child in old_content {
-            let mut best_score = SIMILARITY_THRESHOLD;
-            let mut best_idx: Option<usize> = None;
-
-            for (idx, new_child) in new_children.iter().enumerate() {
-                if matched_new[idx] {
-                    continue;
-                }
-
-                let score = Self::get_match_score(old_child, new_child);
-                if score > best_score {
-                    best_score = score;
-                    best_idx = Some(idx);
-                }
+        // For each old child (skipping comment markers), find the best
+        // matching new child
+        for old_child in old_children.iter().filter(|c| !c.is_comment_marker()) {
+            let old_signature = old_child.text_signature();
+
+            let best = identical
+                .get(&(old_child.tag.as_str(), old_signature.as_str()))
+                .and_then(|candidates| candidates.iter().copied().find(|&idx| !matched_new[idx]))
+                .map(|idx| (idx, 1.0))
+                .or_else(|| {
+                    Self::most_similar(
+                        old_child,
+                        &old_signature,
+                        new_children,
+                        &new_signatures,
+                        &matched_new,
+                    )
+                });
+
+            if let Some((idx, score)) = best {
+                matched_new[idx] = true;
+                self.match_recursive(old_child, &new_children[idx], score, matches);
             }
+        }
+    }
 
-            if let Some(idx) = best_idx {
-                matched_new[idx] = true;
-                self.match_recursive(old_child, &new_children[idx], matches);
+    /// Find the unmatched new child with the same tag whose signature is most
+    /// similar to `old_signature`, above [`SIMILARITY_THRESHOLD`].
+    ///
+    /// Ties go to the earliest child.
+    fn most_similar(
+        old_child: &TreeNode,
+        old_signature: &str,
+        new_children: &[TreeNode],
+        new_signatures: &[String],
+        matched_new: &[bool],
+    ) -> Option<(usize, f64)> {
+        let mut best_score = SIMILARITY_THRESHOLD;
+        let mut best_idx: Option<usize> = None;
+
+        for (idx, (new_child, new_signature)) in new_children.iter().zip(new_signatures).enumerate()
+        {
+            // Tags must match
+            if matched_new[idx] || old_child.tag != new_child.tag {
+                continue;
+            }
+
+            let score = text_similarity(old_signature, new_signature);
+            if score > best_score {
+                best_score = score;
+                best_idx = Some(idx);
             }
         }
+
+        best_idx.map(|idx| (idx, best_score))
     }
 
+    /// Record a match scored by [`Self::match_children`] and match the
+    /// children of both nodes in turn.
     fn match_recursive(
         &self,
         old_node: &'a TreeNode,
         new_node: &'a TreeNode,
+        score: f64,
         matches: &mut HashMap<*const TreeNode, *const TreeNode>,
     ) {
-        let score = Self::get_match_score(old_node, new_node);
-
-        if score < SIMILARITY_THRESHOLD {
-            return;
-        }
-
         if score < 1.0 {
             tracing::debug!(tag = %old_node.tag, similarity = score, "Partial match");
         }
@@ -98,23 +141,6 @@ impl<'a> TreeMatcher<'a> {
         );
         self.match_children(&old_node.children, &new_node.children, matches);
     }
-
-    fn get_match_score(old_node: &TreeNode, new_node: &TreeNode) -> f64 {
-        // Don't match comment markers
-        if old_node.is_comment_marker() {
-            return -1.0;
-        }
-
-        // Tags must match
-        if old_node.tag != new_node.tag {
-            return -1.0;
-        }
-
-        let old_text = old_node.text_signature();
-        let new_text = new_node.text_signature();
-
-        text_similarity(&old_text, &new_text)
-    }
 }
 
 /// Calculate text similarity ratio using longest common subsequence.
@@ -147,26 +173,49 @@ fn text_similarity(text1: &str, text2: &str) -> f64 {
     (2.0 * lcs_len as f64) / (len1 + len2) as f64
 }
 
-/// Calculate LCS length using space-optimized DP (two-row approach).
+/// Calculate LCS length with the bit-parallel algorithm of Allison–Dix and
+/// Hyyrö.
+///
+/// Each position of `chars2` is one bit, so a step over `chars1` updates 64
+/// DP cells per machine word instead of one: O(n·m/64) rather than the O(n·m)
+/// of the row-by-row table. Signatures of long paragraphs and table cells make
+/// this the matcher's hottest loop.
 fn lcs_length(chars1: &[char], chars2: &[char]) -> usize {
-    let len2 = chars2.len();
+    let words = chars2.len().div_ceil(64);
 
-    let mut prev = vec![0usize; len2 + 1];
-    let mut curr = vec![0usize; len2 + 1];
+    // For each character of `chars2`, the bit positions where it occurs
+    let mut positions: HashMap<char, Vec<u64>> = HashMap::new();
+    for (j, &c) in chars2.iter().enumerate() {
+        positions.entry(c).or_insert_with(|| vec![0; words])[j / 64] |= 1 << (j % 64);
+    }
 
-    for &c1 in chars1 {
-        for (j, &c2) in chars2.iter().enumerate() {
-            curr[j + 1] = if c1 == c2 {
-                prev[j] + 1
-            } else {
-                prev[j + 1].max(curr[j])
-            };
+    // A zero bit in `row` marks a position where the LCS grows
+    let mut row = vec![u64::MAX; words];
+    for c in chars1 {
+        let Some(matches) = positions.get(c) else {
+            // No match anywhere: the row is unchanged
+            continue;
+        };
+        let mut carry = false;
+        for (v, &m) in row.iter_mut().zip(matches) {
+            let u = *v & m;
+            let (sum, overflow_a) = v.overflowing_add(u);
+            let (sum, overflow_b) = sum.overflowing_add(u64::from(carry));
+            carry = overflow_a || overflow_b;
+            // `u` is a subset of `v`, so `v - u` never borrows
+            *v = sum | (*v & !u);
         }
-        std::mem::swap(&mut prev, &mut curr);
-        curr.fill(0);
     }
 
-    prev[len2]
+    // Bits past the end of `chars2` in the last word are not positions, but
+    // carries can clear them: set them again before counting
+    let tail = chars2.len() % 64;
+    if tail != 0
+        && let Some(last) = row.last_mut()
+    {
+        *last |= u64::MAX << tail;
+    }
+    row.iter().map(|v| v.count_zeros() as usize).sum()
 }
 
 #[cfg(test)]
@@ -215,6 +264,83 @@ mod tests {
         assert_eq!(matches.len(), 1);
     }
 
+    #[test]
+    fn test_match_prefers_identical_over_earlier_similar() {
+        let parser = ConfluenceXmlParser::new();
+        let old_tree = parser.parse("<p>Hello World</p>").unwrap();
+        let new_tree = parser
+            .parse("<p>Hello World!</p><p>Hello World</p>")
+            .unwrap();
+
+        let matcher = TreeMatcher::new(&old_tree, &new_tree);
+        let matches = matcher.find_matches();
+
+        assert_eq!(
+            matches.get(&std::ptr::from_ref(&old_tree.children[0])),
+            Some(&std::ptr::from_ref(&new_tree.children[1]))
+        );
+    }
+
+    #[test]
+    fn test_match_repeated_identical_nodes_in_order() {
+        let parser = ConfluenceXmlParser::new();
+        let old_tree = parser.parse("<p>Same</p><p>Same</p>").unwrap();
+        let new_tree = parser.parse("<p>Same</p><p>Same</p>").unwrap();
+
+        let matcher = TreeMatcher::new(&old_tree, &new_tree);
+        let matches = matcher.find_matches();
+
+        assert_eq!(matches.len(), 2);
+        for (old, new) in old_tree.children.iter().zip(&new_tree.children) {
+            assert_eq!(
+                matches.get(&std::ptr::from_ref(old)),
+                Some(&std::ptr::from_ref(new))
+            );
+        }
+    }
+
+    /// Reference LCS length from the full DP table.
+    fn lcs_length_table(chars1: &[char], chars2: &[char]) -> usize {
+        let mut table = vec![vec![0usize; chars2.len() + 1]; chars1.len() + 1];
+        for (i, &c1) in chars1.iter().enumerate() {
+            for (j, &c2) in chars2.iter().enumerate() {
+                table[i + 1][j + 1] = if c1 == c2 {
+                    table[i][j] + 1
+                } else {
+                    table[i][j + 1].max(table[i + 1][j])
+                };
+            }
+        }
+        table[chars1.len()][chars2.len()]
+    }
+
+    #[test]
+    fn test_lcs_length_matches_dp_table() {
+        let long_a = "the quick brown fox jumps over the lazy dog ".repeat(4);
+        let long_b = "a quick brown cat leaps over two lazy dogs, ".repeat(4);
+        let cases = [
+            ("", "abc"),
+            ("abc", ""),
+            ("abc", "abc"),
+            ("abcbdab", "bdcaba"),
+            ("xyz", "abc"),
+            ("проверяет тип", "проверка типа"),
+            (long_a.as_str(), long_b.as_str()),
+            (long_b.as_str(), long_a.as_str()),
+            (long_a.as_str(), &long_a[..64]),
+            (&long_a[..65], &long_b[..128]),
+        ];
+        for (a, b) in cases {
+            let a: Vec<char> = a.chars().collect();
+            let b: Vec<char> = b.chars().collect();
+            assert_eq!(
+                lcs_length(&a, &b),
+                lcs_length_table(&a, &b),
+                "{a:?} vs {b:?}"
+            );
+        }
+    }
+
     #[test]
     fn test_text_similarity_identical() {
         assert!((text_similarity("hello", "hello") - 1.0).abs() < f64::EPSILON);
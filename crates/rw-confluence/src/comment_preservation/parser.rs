@@ -13,11 +13,15 @@ use super::entities::convert_html_entities;
 use super::tree::TreeNode;
 use crate::error::CommentPreservationError;
 
-/// Confluence XML namespaces.
-const NAMESPACES: &[(&str, &str)] = &[
-    ("ac", "http://www.atlassian.com/schema/confluence/4/ac/"),
-    ("ri", "http://www.atlassian.com/schema/confluence/4/ri/"),
-];
+/// Opening tag of the wrapper element, declaring the Confluence `ac:` and
+/// `ri:` namespaces so prefixed elements parse.
+const ROOT_START: &str = concat!(
+    r#"<root xmlns:ac="http://www.atlassian.com/schema/confluence/4/ac/""#,
+    r#" xmlns:ri="http://www.atlassian.com/schema/confluence/4/ri/">"#,
+);
+
+/// Closing tag of the wrapper element.
+const ROOT_END: &str = "</root>";
 
 /// Parse Confluence XHTML with namespace support.
 pub struct ConfluenceXmlParser;
@@ -41,13 +45,11 @@ impl ConfluenceXmlParser {
         // Convert HTML entities to Unicode
         let html = convert_html_entities(html);
 
-        // Add namespace declarations to root
-        let namespace_decls = NAMESPACES
-            .iter()
-            .map(|(prefix, uri)| format!(r#"xmlns:{prefix}="{uri}""#))
-            .collect::<Vec<_>>()
-            .join(" ");
-        let wrapped = format!("<root {namespace_decls}>{html}</root>");
+        // Wrap in a root element carrying the namespace declarations
+        let mut wrapped = String::with_capacity(ROOT_START.len() + html.len() + ROOT_END.len());
+        wrapped.push_str(ROOT_START);
+        wrapped.push_str(&html);
+        wrapped.push_str(ROOT_END);
 
         let mut reader = Reader::from_str(&wrapped);
         reader.config_mut().trim_text(false);
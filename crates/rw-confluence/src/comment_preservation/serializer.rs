@@ -2,10 +2,9 @@
 
 #![allow(clippy::unused_self)] // Unit struct methods have &self for API consistency
 
-use std::fmt::Write;
 use std::sync::LazyLock;
 
-use regex::Regex;
+use regex::{Captures, Regex, Replacer};
 
 use super::tree::TreeNode;
 
@@ -49,6 +48,9 @@ impl Default for ConfluenceXmlSerializer {
 }
 
 /// Serialize a single node recursively.
+///
+/// Everything, escaped text included, is written straight into `out`, so
+/// serializing a tree allocates nothing per node.
 fn serialize_node(node: &TreeNode, out: &mut String) {
     // Opening tag
     out.push('<');
@@ -56,7 +58,11 @@ fn serialize_node(node: &TreeNode, out: &mut String) {
 
     // Attributes
     for (key, value) in &node.attrs {
-        write!(out, r#" {}="{}""#, key, escape_attr(value)).unwrap();
+        out.push(' ');
+        out.push_str(key);
+        out.push_str("=\"");
+        escape_xml_into(out, value, true);
+        out.push('"');
     }
 
     if node.children.is_empty() && node.text.is_empty() {
@@ -66,9 +72,7 @@ fn serialize_node(node: &TreeNode, out: &mut String) {
         out.push('>');
 
         // Text content
-        if !node.text.is_empty() {
-            out.push_str(&escape_text(&node.text));
-        }
+        escape_xml_into(out, &node.text, false);
 
         // Children
         for child in &node.children {
@@ -76,62 +80,92 @@ fn serialize_node(node: &TreeNode, out: &mut String) {
         }
 
         // Closing tag
-        write!(out, "</{}>", node.tag).unwrap();
+        out.push_str("</");
+        out.push_str(&node.tag);
+        out.push('>');
     }
 
     // Tail text
-    if !node.tail.is_empty() {
-        out.push_str(&escape_text(&node.tail));
-    }
-}
-
-/// Escape text for XML content.
-fn escape_text(text: &str) -> String {
-    escape_xml(text, false)
+    escape_xml_into(out, &node.tail, false);
 }
 
-/// Escape text for XML attribute values.
-fn escape_attr(text: &str) -> String {
-    escape_xml(text, true)
+/// Append `text` to `out`, escaping XML special characters.
+///
+/// Quotes are escaped only when `escape_quotes` is set, for attribute values.
+/// Runs of ordinary characters are copied as whole slices. Every escaped
+/// character is ASCII, so scanning bytes never splits a UTF-8 sequence.
+fn escape_xml_into(out: &mut String, text: &str, escape_quotes: bool) {
+    let mut copied = 0;
+    for (idx, byte) in text.bytes().enumerate() {
+        let escaped = match byte {
+            b'&' => "&amp;",
+            b'<' => "&lt;",
+            b'>' => "&gt;",
+            b'"' if escape_quotes => "&quot;",
+            b'\'' if escape_quotes => "&apos;",
+            _ => continue,
+        };
+        out.push_str(&text[copied..idx]);
+        out.push_str(escaped);
+        copied = idx + 1;
+    }
+    out.push_str(&text[copied..]);
 }
 
-/// Escape XML special characters.
-fn escape_xml(text: &str, escape_quotes: bool) -> String {
-    let mut result = String::with_capacity(text.len());
-    for ch in text.chars() {
-        match ch {
-            '&' => result.push_str("&amp;"),
-            '<' => result.push_str("&lt;"),
-            '>' => result.push_str("&gt;"),
-            '"' if escape_quotes => result.push_str("&quot;"),
-            '\'' if escape_quotes => result.push_str("&apos;"),
-            _ => result.push(ch),
+/// XML entities undone inside restored CDATA sections.
+const XML_ENTITIES: &[(&str, char)] = &[
+    ("&lt;", '<'),
+    ("&gt;", '>'),
+    ("&amp;", '&'),
+    ("&quot;", '"'),
+    ("&apos;", '\''),
+];
+
+/// Append `text` to `out`, unescaping XML entities in a single pass.
+///
+/// Each entity is decoded once, so escaped entity text such as `&amp;quot;`
+/// comes back as `&quot;` rather than being decoded a second time.
+fn unescape_xml_into(out: &mut String, text: &str) {
+    let mut rest = text;
+    while let Some(idx) = rest.find('&') {
+        out.push_str(&rest[..idx]);
+        rest = &rest[idx..];
+        if let Some(&(entity, ch)) = XML_ENTITIES
+            .iter()
+            .find(|(entity, _)| rest.starts_with(entity))
+        {
+            out.push(ch);
+            rest = &rest[entity.len()..];
+        } else {
+            out.push('&');
+            rest = &rest[1..];
         }
     }
-    result
+    out.push_str(rest);
 }
 
 /// Restore CDATA sections for plain-text-body elements.
 fn restore_cdata_sections(html: &str) -> String {
     PLAIN_TEXT_BODY_PATTERN
-        .replace_all(html, |caps: &regex::Captures| {
-            let tag_start = &caps[1];
-            let content = &caps[2];
-            let tag_end = &caps[3];
-
-            // Unescape XML entities that were escaped during serialization
-            let content = content
-                .replace("&lt;", "<")
-                .replace("&gt;", ">")
-                .replace("&amp;", "&")
-                .replace("&quot;", "\"")
-                .replace("&apos;", "'");
-
-            format!("{tag_start}<![CDATA[{content}]]>{tag_end}")
-        })
+        .replace_all(html, CdataReplacer)
         .into_owned()
 }
 
+/// Rewrites a matched plain-text-body element with its content unescaped into
+/// a CDATA section, appending straight into the output buffer.
+struct CdataReplacer;
+
+impl Replacer for CdataReplacer {
+    fn replace_append(&mut self, caps: &Captures<'_>, dst: &mut String) {
+        dst.push_str(&caps[1]);
+        dst.push_str("<![CDATA[");
+        // Unescape XML entities that were escaped during serialization
+        unescape_xml_into(dst, &caps[2]);
+        dst.push_str("]]>");
+        dst.push_str(&caps[3]);
+    }
+}
+
 #[cfg(test)]
 mod tests {
     use super::*;
@@ -208,4 +242,39 @@ mod tests {
             "<ac:plain-text-body><![CDATA[<code>]]></ac:plain-text-body>"
         );
     }
+
+    #[test]
+    fn test_restore_cdata_sections_decodes_each_entity_once() {
+        let html = "<ac:plain-text-body>a &amp;quot;b&amp;quot; &amp; c</ac:plain-text-body>";
+        let result = restore_cdata_sections(html);
+        assert_eq!(
+            result,
+            "<ac:plain-text-body><![CDATA[a &quot;b&quot; & c]]></ac:plain-text-body>"
+        );
+    }
+
+    #[test]
+    fn test_escape_attribute_quotes() {
+        let mut attrs = std::collections::HashMap::new();
+        attrs.insert("title".to_owned(), r#"say "hi" & 'bye'"#.to_owned());
+        let p = TreeNode::new("p").with_attrs(attrs).with_text("x");
+        let root = TreeNode::new("root").with_children(vec![p]);
+
+        let html = ConfluenceXmlSerializer::new().serialize(&root);
+
+        assert_eq!(
+            html,
+            r#"<p title="say &quot;hi&quot; &amp; &apos;bye&apos;">x</p>"#
+        );
+    }
+
+    #[test]
+    fn test_escape_preserves_multibyte_text() {
+        let p = TreeNode::new("p").with_text("проверка <тип> — ok");
+        let root = TreeNode::new("root").with_children(vec![p]);
+
+        let html = ConfluenceXmlSerializer::new().serialize(&root);
+
+        assert_eq!(html, "<p>проверка &lt;тип&gt; — ok</p>");
+    }
 }
@@ -35,30 +35,12 @@ impl CommentMarkerTransfer {
     ) {
         let mut transferred_count = 0;
 
-        // Build mapping: old_ptr -> old_node (for looking up original nodes)
-        let old_nodes_by_ptr = collect_nodes_by_ptr(old_tree);
-
-        // Phase 1: Transfer markers from matched nodes
-        for (&old_ptr, &new_ptr) in matches {
-            let Some(old_node) = old_nodes_by_ptr.get(&old_ptr) else {
-                continue;
-            };
-
-            let markers = old_node.comment_markers();
-            if markers.is_empty() {
-                continue;
-            }
-
-            tracing::debug!(count = markers.len(), tag = %old_node.tag, "Transferring markers");
-
-            for marker in markers {
-                let ref_id = marker.marker_ref().unwrap_or("").to_owned();
-                if self.transfer_marker_to_ptr(new_tree, new_ptr, marker) {
-                    self.transferred_refs.insert(ref_id);
-                    transferred_count += 1;
-                }
-            }
-        }
+        // Phase 1: Transfer markers from matched nodes. Group them by their
+        // matched new node in one walk of the old tree, then place them in one
+        // walk of the new tree rather than searching it once per match.
+        let mut markers_by_target = HashMap::new();
+        collect_matched_markers(old_tree, matches, &mut markers_by_target);
+        self.transfer_matched(new_tree, &markers_by_target, &mut transferred_count);
 
         // Phase 2: Handle markers whose parents were not matched (global fallback)
         let all_old_markers = find_all_markers(old_tree);
@@ -96,25 +78,38 @@ impl CommentMarkerTransfer {
         self.unmatched_comments
     }
 
-    fn transfer_marker_to_ptr(
-        &self,
-        new_tree: &mut TreeNode,
-        target_ptr: *const TreeNode,
-        marker: &TreeNode,
-    ) -> bool {
-        let marker_text = marker.text.trim();
-        if marker_text.is_empty() {
-            tracing::warn!("Empty comment marker text, skipping");
-            return false;
+    /// Insert each node's matched markers, visiting the tree in post-order.
+    ///
+    /// Inserting a marker shifts the children of the node it lands in, which
+    /// moves them in memory. Post-order visits those children before their
+    /// parent can be modified, so every node is still at the address the
+    /// matcher recorded when its own turn comes.
+    fn transfer_matched(
+        &mut self,
+        node: &mut TreeNode,
+        markers_by_target: &HashMap<*const TreeNode, Vec<&TreeNode>>,
+        transferred_count: &mut usize,
+    ) {
+        for child in &mut node.children {
+            self.transfer_matched(child, markers_by_target, transferred_count);
         }
 
-        // Find the mutable node by pointer
-        if let Some(target_node) = find_node_mut_by_ptr(new_tree, target_ptr) {
-            let new_marker = clone_marker(marker);
-            return insert_marker_by_text(target_node, new_marker, marker_text);
-        }
+        let Some(markers) = markers_by_target.get(&std::ptr::from_ref::<TreeNode>(node)) else {
+            return;
+        };
+        for marker in markers {
+            let marker_text = marker.text.trim();
+            if marker_text.is_empty() {
+                tracing::warn!("Empty comment marker text, skipping");
+                continue;
+            }
 
-        false
+            if insert_marker_by_text(node, clone_marker(marker), marker_text) {
+                let ref_id = marker.marker_ref().unwrap_or("").to_owned();
+                self.transferred_refs.insert(ref_id);
+                *transferred_count += 1;
+            }
+        }
     }
 
     fn try_global_insert(&self, tree: &mut TreeNode, marker: &TreeNode) -> bool {
@@ -142,34 +137,26 @@ fn clone_marker(marker: &TreeNode) -> TreeNode {
         .with_attrs(marker.attrs.clone())
 }
 
-/// Collect all nodes into a map by pointer.
-fn collect_nodes_by_ptr(node: &TreeNode) -> HashMap<*const TreeNode, &TreeNode> {
-    let mut map = HashMap::new();
-    collect_nodes_recursive(node, &mut map);
-    map
-}
-
-fn collect_nodes_recursive<'a>(
+/// Collect the comment markers of every matched old node, keyed by the new
+/// node it matched.
+fn collect_matched_markers<'a>(
     node: &'a TreeNode,
-    map: &mut HashMap<*const TreeNode, &'a TreeNode>,
+    matches: &HashMap<*const TreeNode, *const TreeNode>,
+    markers_by_target: &mut HashMap<*const TreeNode, Vec<&'a TreeNode>>,
 ) {
-    map.insert(std::ptr::from_ref::<TreeNode>(node), node);
-    for child in &node.children {
-        collect_nodes_recursive(child, map);
-    }
-}
-
-/// Find a mutable node by its original pointer.
-fn find_node_mut_by_ptr(node: &mut TreeNode, target_ptr: *const TreeNode) -> Option<&mut TreeNode> {
-    if std::ptr::eq(node, target_ptr) {
-        return Some(node);
-    }
-    for child in &mut node.children {
-        if let Some(found) = find_node_mut_by_ptr(child, target_ptr) {
-            return Some(found);
+    if let Some(&new_ptr) = matches.get(&std::ptr::from_ref::<TreeNode>(node)) {
+        let markers = node.comment_markers();
+        if !markers.is_empty() {
+            tracing::debug!(count = markers.len(), tag = %node.tag, "Transferring markers");
+            markers_by_target
+                .entry(new_ptr)
+                .or_default()
+                .extend(markers);
         }
     }
-    None
+    for child in &node.children {
+        collect_matched_markers(child, matches, markers_by_target);
+    }
 }
 
 /// Find all comment markers in a tree.
@@ -369,4 +356,41 @@ mod tests {
         assert_eq!(transfer.unmatched_comments.len(), 1);
         assert_eq!(transfer.unmatched_comments[0].text, "original");
     }
+
+    #[test]
+    fn test_transfer_markers_into_nested_matched_nodes() {
+        let parser = ConfluenceXmlParser::new();
+        let old_html = r#"<div><ac:inline-comment-marker ac:ref="a">intro</ac:inline-comment-marker> text<p><ac:inline-comment-marker ac:ref="b">para</ac:inline-comment-marker> more</p></div>"#;
+        let new_html = "<div>intro text<p>para more</p></div>";
+
+        let old_tree = parser.parse(old_html).unwrap();
+        let mut new_tree = parser.parse(new_html).unwrap();
+
+        // Match both the div and the p nested in it: placing the div's marker
+        // shifts the p, which must still receive its own marker directly.
+        let old_div = &old_tree.children[0];
+        let new_div = &new_tree.children[0];
+        let mut matches = HashMap::new();
+        matches.insert(
+            std::ptr::from_ref::<TreeNode>(old_div),
+            std::ptr::from_ref::<TreeNode>(new_div),
+        );
+        matches.insert(
+            std::ptr::from_ref::<TreeNode>(&old_div.children[1]),
+            std::ptr::from_ref::<TreeNode>(&new_div.children[0]),
+        );
+
+        let mut transfer = CommentMarkerTransfer::new();
+        transfer.transfer(&matches, &mut new_tree, &old_tree);
+
+        assert!(transfer.unmatched_comments.is_empty());
+        let div = &new_tree.children[0];
+        assert_eq!(div.children.len(), 2);
+        assert_eq!(div.children[0].marker_ref(), Some("a"));
+        assert_eq!(div.children[0].tail, " text");
+        let p = &div.children[1];
+        assert_eq!(p.children.len(), 1);
+        assert_eq!(p.children[0].marker_ref(), Some("b"));
+        assert_eq!(p.children[0].tail, " more");
+    }
 }
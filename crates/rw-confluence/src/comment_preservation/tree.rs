@@ -2,8 +2,11 @@
 
 use std::collections::HashMap;
 
-/// Confluence namespace URI.
-pub const AC_NAMESPACE: &str = "http://www.atlassian.com/schema/confluence/4/ac/";
+/// Local name shared by every spelling of the comment marker tag.
+const COMMENT_MARKER_NAME: &str = "inline-comment-marker";
+
+/// The `ac:ref` attribute with the Confluence namespace URI expanded.
+const AC_REF_NAMESPACED: &str = "{http://www.atlassian.com/schema/confluence/4/ac/}ref";
 
 /// Node in parsed HTML tree.
 #[derive(Debug, Default)]
@@ -68,38 +71,34 @@ impl TreeNode {
     /// Concatenates direct text, children's signatures, and tail text with spaces.
     #[must_use]
     pub fn text_signature(&self) -> String {
-        let mut parts = Vec::new();
-
-        let text_trimmed = self.text.trim();
-        if !text_trimmed.is_empty() {
-            parts.push(text_trimmed.to_owned());
-        }
+        let mut signature = String::new();
+        self.write_text_signature(&mut signature);
+        signature
+    }
 
+    /// Append this node's text signature to `out`.
+    ///
+    /// The whole subtree is written into one buffer, rather than each level
+    /// building and joining its own parts, so a deep tree costs a single
+    /// allocation instead of one per node.
+    fn write_text_signature(&self, out: &mut String) {
+        push_signature_part(out, self.text.trim());
         for child in &self.children {
-            let sig = child.text_signature();
-            if !sig.is_empty() {
-                parts.push(sig);
-            }
+            child.write_text_signature(out);
         }
-
-        let tail_trimmed = self.tail.trim();
-        if !tail_trimmed.is_empty() {
-            parts.push(tail_trimmed.to_owned());
-        }
-
-        parts.join(" ")
+        push_signature_part(out, self.tail.trim());
     }
 
     /// Check if this node is an inline comment marker.
     #[must_use]
     pub fn is_comment_marker(&self) -> bool {
-        // Handle multiple formats:
+        // One substring test covers every format:
         // - Full namespace URI: {http://...}inline-comment-marker
         // - Prefixed: ac:inline-comment-marker
         // - Plain: inline-comment-marker
-        self.tag == format!("{{{AC_NAMESPACE}}}inline-comment-marker")
-            || self.tag == "ac:inline-comment-marker"
-            || self.tag.contains("inline-comment-marker")
+        // Called for nearly every node during matching and transfer, so it
+        // must not allocate.
+        self.tag.contains(COMMENT_MARKER_NAME)
     }
 
     /// Get the `ac:ref` attribute value from a comment marker.
@@ -107,7 +106,7 @@ impl TreeNode {
     pub fn marker_ref(&self) -> Option<&str> {
         // Try namespaced version first
         self.attrs
-            .get(&format!("{{{AC_NAMESPACE}}}ref"))
+            .get(AC_REF_NAMESPACED)
             .or_else(|| self.attrs.get("ac:ref"))
             .map(String::as_str)
     }
@@ -122,6 +121,18 @@ impl TreeNode {
     }
 }
 
+/// Append a non-empty signature part to `out`, space-separated from any
+/// previous part.
+fn push_signature_part(out: &mut String, part: &str) {
+    if part.is_empty() {
+        return;
+    }
+    if !out.is_empty() {
+        out.push(' ');
+    }
+    out.push_str(part);
+}
+
 #[cfg(test)]
 mod tests {
     use super::*;
@@ -145,6 +156,19 @@ mod tests {
         assert_eq!(node.text_signature(), "Hello World");
     }
 
+    #[test]
+    fn test_text_signature_nested_skips_empty_parts() {
+        let em = TreeNode::new("em").with_text("  deep ").with_tail("  ");
+        let strong = TreeNode::new("strong")
+            .with_children(vec![em])
+            .with_tail(" after ");
+        let node = TreeNode::new("p")
+            .with_text(" start ")
+            .with_children(vec![TreeNode::new("br"), strong])
+            .with_tail("end");
+        assert_eq!(node.text_signature(), "start deep after end");
+    }
+
     #[test]
     fn test_is_comment_marker_namespaced() {
         let node = TreeNode::new(
@@ -159,6 +183,12 @@ mod tests {
         assert!(node.is_comment_marker());
     }
 
+    #[test]
+    fn test_is_comment_marker_plain() {
+        let node = TreeNode::new("inline-comment-marker");
+        assert!(node.is_comment_marker());
+    }
+
     #[test]
     fn test_is_comment_marker_false() {
         let node = TreeNode::new("p");
@@ -2,6 +2,8 @@
 //!
 //! Provides [`DiagramKey`] for computing content-based hashes used as cache keys.
 
+use std::io::Write as _;
+
 use sha2::{Digest, Sha256};
 
 use crate::language::{DiagramFormat, DiagramLanguage};
@@ -61,19 +63,38 @@ impl DiagramKey<'_> {
     /// # Hash Format
     ///
     /// SHA-256 of `"{endpoint}:{format}:{dpi}:{source}"`.
+    ///
+    /// The hash names published Confluence attachments, so the algorithm and
+    /// byte layout are fixed. The pieces are fed to the hasher one by one, and
+    /// the DPI is formatted on the stack, so computing a key allocates nothing
+    /// but the hex digest.
     #[must_use]
     pub fn compute_hash(&self) -> String {
-        let content = format!(
-            "{}:{}:{}:{}",
-            self.endpoint, self.format, self.dpi, self.source
-        );
         let mut hasher = Sha256::new();
-        hasher.update(content.as_bytes());
+        hasher.update(self.endpoint.as_bytes());
+        hasher.update(b":");
+        hasher.update(self.format.as_bytes());
+        hasher.update(b":");
+        update_decimal(&mut hasher, self.dpi);
+        hasher.update(b":");
+        hasher.update(self.source.as_bytes());
         let result = hasher.finalize();
         hex::encode(result)
     }
 }
 
+/// Feed `value` to `hasher` as decimal digits, the bytes `value.to_string()`
+/// would produce, without allocating.
+fn update_decimal(hasher: &mut Sha256, value: u32) {
+    // u32::MAX has 10 digits
+    let mut buf = [0u8; 10];
+    let mut rest = &mut buf[..];
+    write!(rest, "{value}").expect("a u32 has at most 10 digits");
+    let unused = rest.len();
+    let len = buf.len() - unused;
+    hasher.update(&buf[..len]);
+}
+
 #[cfg(test)]
 mod tests {
     use super::*;
@@ -141,6 +162,17 @@ mod tests {
         );
     }
 
+    #[test]
+    fn test_diagram_key_hash_matches_formatted_content() {
+        let key = make_key("@startuml\nA -> B\n@enduml", "plantuml", "png");
+        let content = format!("plantuml:png:{DEFAULT_DPI}:@startuml\nA -> B\n@enduml");
+
+        assert_eq!(
+            key.compute_hash(),
+            hex::encode(Sha256::digest(content.as_bytes()))
+        );
+    }
+
     /// Confluence attachments are named `diagram_<hash12>.png` from this key, so
     /// the hash is part of rw's published output: changing it renames every
     /// attachment on the next publish, and Confluence keeps the old ones too.
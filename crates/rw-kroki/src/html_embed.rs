@@ -2,6 +2,9 @@
 //! - SVG dimension scaling based on DPI
 //! - Google Fonts stripping from SVG
 
+use std::borrow::Cow;
+use std::fmt::Write as _;
+use std::ops::Range;
 use std::sync::LazyLock;
 
 use regex::Regex;
@@ -14,22 +17,6 @@ static GOOGLE_FONTS_RE: LazyLock<Regex> = LazyLock::new(|| {
     Regex::new(r"@import\s+url\([^)]*fonts\.googleapis\.com[^)]*\)\s*;?").unwrap()
 });
 
-/// Regex to match SVG width attribute with pixel value (integer or decimal).
-static SVG_WIDTH_RE: LazyLock<Regex> =
-    LazyLock::new(|| Regex::new(r#"(<svg[^>]*\s)width="(\d+(?:\.\d+)?)(?:px)?""#).unwrap());
-
-/// Regex to match SVG height attribute with pixel value (integer or decimal).
-static SVG_HEIGHT_RE: LazyLock<Regex> =
-    LazyLock::new(|| Regex::new(r#"(<svg[^>]*\s)height="(\d+(?:\.\d+)?)(?:px)?""#).unwrap());
-
-/// Regex to match width in style attribute (e.g., `width:136px`).
-static STYLE_WIDTH_RE: LazyLock<Regex> =
-    LazyLock::new(|| Regex::new(r"(width:\s*)(\d+(?:\.\d+)?)(px)").unwrap());
-
-/// Regex to match height in style attribute (e.g., `height:210px`).
-static STYLE_HEIGHT_RE: LazyLock<Regex> =
-    LazyLock::new(|| Regex::new(r"(height:\s*)(\d+(?:\.\d+)?)(px)").unwrap());
-
 /// Scale SVG width and height based on DPI.
 ///
 /// Diagrams are rendered at a configured DPI (e.g., 192 for retina displays).
@@ -37,7 +24,9 @@ static STYLE_HEIGHT_RE: LazyLock<Regex> =
 /// at its intended physical size. For example, a diagram rendered at 192 DPI
 /// will have its dimensions halved to display correctly on standard 96 DPI displays.
 ///
-/// Scales both XML attributes (`width="136"`) and inline style properties (`width:136px`).
+/// Scales both XML attributes (`width="136"`) and inline style properties
+/// (`width:136px`) of the root `<svg>` tag. Everything after that tag is
+/// drawn in `viewBox` units and scales with it, so it is copied unchanged.
 ///
 /// The scaling factor is `STANDARD_DPI / dpi`. At 192 DPI, this is 0.5 (halved).
 /// At 96 DPI, dimensions are unchanged.
@@ -49,52 +38,162 @@ static STYLE_HEIGHT_RE: LazyLock<Regex> =
 #[allow(clippy::cast_possible_truncation, clippy::cast_sign_loss)]
 #[must_use]
 pub fn scale_svg_dimensions(svg: &str, dpi: u32) -> (String, Option<Size>) {
-    // Helper to scale a dimension value and format the result
-    let scale_dim = |caps: &regex::Captures| {
-        let value: f64 = caps[2].parse().unwrap_or(0.0);
-        to_display_f64(value, dpi).round() as u32
+    let Some(tag) = svg_open_tag(svg) else {
+        return (svg.to_owned(), None);
     };
+    let rewrite = dpi != STANDARD_DPI;
 
-    // The size ends up the same whether or not the string gets rewritten
-    // below, so it's read from the original `<svg>` tag once, up front.
-    let size = match (SVG_WIDTH_RE.captures(svg), SVG_HEIGHT_RE.captures(svg)) {
-        (Some(width), Some(height)) => Some(Size {
-            width: scale_dim(&width),
-            height: scale_dim(&height),
-        }),
-        _ => None,
-    };
+    // One forward pass over the tag both reads the size and, unless the DPI
+    // is standard, copies the tag with every dimension scaled.
+    let mut scaled = String::new();
+    if rewrite {
+        scaled.reserve(svg.len());
+        scaled.push_str(&svg[..tag.start]);
+    }
+    let (mut width, mut height) = (None, None);
+    let mut copied = tag.start;
+    let mut pos = tag.start;
+    while let Some(dim) = next_dimension(&svg[..tag.end], pos) {
+        let px = to_display_f64(dim.value, dpi).round() as u32;
+        if dim.attribute && dim.width {
+            width = Some(px);
+        } else if dim.attribute {
+            height = Some(px);
+        }
+        if rewrite {
+            scaled.push_str(&svg[copied..dim.span.start]);
+            write!(scaled, "{px}").unwrap();
+            if !dim.attribute {
+                scaled.push_str("px");
+            }
+        }
+        copied = dim.span.end;
+        pos = dim.span.end;
+    }
 
-    if dpi == STANDARD_DPI {
+    let size = width
+        .zip(height)
+        .map(|(width, height)| Size { width, height });
+    if !rewrite {
         return (svg.to_owned(), size);
     }
+    scaled.push_str(&svg[copied..]);
+    (scaled, size)
+}
+
+/// Byte range of the root `<svg ...>` opening tag, up to its first `>`.
+fn svg_open_tag(svg: &str) -> Option<Range<usize>> {
+    let start = svg.find("<svg")?;
+    let end = start + svg[start..].find('>')?;
+    Some(start..end)
+}
 
-    // Scale XML attributes (width="136", height="210")
-    let result = SVG_WIDTH_RE.replace(svg, |caps: &regex::Captures| {
-        format!(r#"{}width="{}""#, &caps[1], scale_dim(caps))
-    });
-    let result = SVG_HEIGHT_RE.replace(&result, |caps: &regex::Captures| {
-        format!(r#"{}height="{}""#, &caps[1], scale_dim(caps))
-    });
+/// A pixel dimension found in the `<svg>` tag.
+struct Dimension {
+    /// `width` rather than `height`.
+    width: bool,
+    /// An XML attribute (`width="136"`) rather than a style property
+    /// (`width:136px`).
+    attribute: bool,
+    value: f64,
+    /// The number with its `px` suffix, which is what gets rewritten.
+    span: Range<usize>,
+}
+
+/// Find the next dimension in `tag` at or after byte `from`.
+///
+/// Attributes must be preceded by whitespace, so `stroke-width="2"` is not
+/// one; their `px` suffix is optional and dropped on rewrite. Style
+/// properties match by suffix (`max-width:` counts) and need the `px`.
+fn next_dimension(tag: &str, from: usize) -> Option<Dimension> {
+    let bytes = tag.as_bytes();
+    let mut i = from;
+    while i < bytes.len() {
+        let (width, name_len) = match bytes[i] {
+            b'w' if bytes[i..].starts_with(b"width") => (true, "width".len()),
+            b'h' if bytes[i..].starts_with(b"height") => (false, "height".len()),
+            _ => {
+                i += 1;
+                continue;
+            }
+        };
+        let after = i + name_len;
+        let found = match bytes.get(after) {
+            Some(b'=') if i > 0 && bytes[i - 1].is_ascii_whitespace() => {
+                attribute_dimension(tag, after + 1)
+            }
+            Some(b':') => style_dimension(tag, after + 1),
+            _ => None,
+        };
+        if let Some((value, span)) = found {
+            return Some(Dimension {
+                width,
+                attribute: bytes[after] == b'=',
+                value,
+                span,
+            });
+        }
+        i = after;
+    }
+    None
+}
+
+/// Parse `"136"` or `"136px"` at `at`, returning the value and the range of
+/// the number and its suffix (inside the quotes).
+fn attribute_dimension(tag: &str, at: usize) -> Option<(f64, Range<usize>)> {
+    if tag.as_bytes().get(at) != Some(&b'"') {
+        return None;
+    }
+    let start = at + 1;
+    let (value, mut end) = parse_number(tag, start)?;
+    if tag[end..].starts_with("px") {
+        end += "px".len();
+    }
+    (tag.as_bytes().get(end) == Some(&b'"')).then_some((value, start..end))
+}
 
-    // Scale inline style properties (width:136px, height:210px)
-    let result = STYLE_WIDTH_RE.replace_all(&result, |caps: &regex::Captures| {
-        format!("{}{}{}", &caps[1], scale_dim(caps), &caps[3])
-    });
-    let result = STYLE_HEIGHT_RE.replace_all(&result, |caps: &regex::Captures| {
-        format!("{}{}{}", &caps[1], scale_dim(caps), &caps[3])
-    });
+/// Parse ` 136px` at `at` (leading whitespace allowed), returning the value
+/// and the range of the number and its `px`.
+fn style_dimension(tag: &str, at: usize) -> Option<(f64, Range<usize>)> {
+    let start = at + tag[at..].len() - tag[at..].trim_start().len();
+    let (value, number_end) = parse_number(tag, start)?;
+    tag[number_end..]
+        .starts_with("px")
+        .then_some((value, start..number_end + "px".len()))
+}
 
-    (result.into_owned(), size)
+/// Parse `136` or `1610.5` at `start`, returning the value and where it ends.
+fn parse_number(tag: &str, start: usize) -> Option<(f64, usize)> {
+    let digits = |from: usize| {
+        tag.as_bytes()[from..]
+            .iter()
+            .take_while(|b| b.is_ascii_digit())
+            .count()
+    };
+    let int_len = digits(start);
+    if int_len == 0 {
+        return None;
+    }
+    let mut end = start + int_len;
+    if tag.as_bytes().get(end) == Some(&b'.') {
+        let frac_len = digits(end + 1);
+        if frac_len > 0 {
+            end += 1 + frac_len;
+        }
+    }
+    Some((tag[start..end].parse().ok()?, end))
 }
 
 /// Strip Google Fonts @import from SVG to avoid external requests.
 ///
 /// `PlantUML` embeds `@import url('https://fonts.googleapis.com/...')` in SVG
 /// when using Roboto font. We remove this since Roboto is bundled locally.
+///
+/// Borrows `svg` when there is nothing to strip, which is every non-`PlantUML`
+/// diagram.
 #[must_use]
-pub fn strip_google_fonts_import(svg: &str) -> String {
-    GOOGLE_FONTS_RE.replace_all(svg, "").to_string()
+pub fn strip_google_fonts_import(svg: &str) -> Cow<'_, str> {
+    GOOGLE_FONTS_RE.replace_all(svg, "")
 }
 
 #[cfg(test)]
@@ -201,6 +300,31 @@ mod tests {
         assert_eq!(size, None);
     }
 
+    #[test]
+    fn scale_svg_dimensions_leaves_the_drawing_alone() {
+        // Only the root tag is in display pixels; a stroke inside the drawing
+        // is in viewBox units and already scales with the tag.
+        let svg = r#"<svg width="400" height="200" stroke-width="4"><line style="stroke-width:2px;"/></svg>"#;
+        let (result, _size) = scale_svg_dimensions(svg, 192);
+        assert_eq!(
+            result,
+            r#"<svg width="200" height="100" stroke-width="4"><line style="stroke-width:2px;"/></svg>"#
+        );
+    }
+
+    #[test]
+    fn scale_svg_dimensions_scales_max_width_style() {
+        // Mermaid sizes its root tag with `max-width` rather than `width`
+        let svg =
+            r#"<svg width="100%" style="max-width: 1610.5px;" viewBox="0 0 1610.5 633"></svg>"#;
+        let (result, size) = scale_svg_dimensions(svg, 192);
+        assert_eq!(
+            result,
+            r#"<svg width="100%" style="max-width: 805px;" viewBox="0 0 1610.5 633"></svg>"#
+        );
+        assert_eq!(size, None, "a percentage width is not a size");
+    }
+
     #[test]
     fn test_strip_google_fonts_import() {
         let svg_with_import =
@@ -213,6 +337,7 @@ mod tests {
     fn test_strip_google_fonts_import_no_change() {
         let svg_without_import = r"<style>.diagram { fill: blue; }</style>";
         let result = strip_google_fonts_import(svg_without_import);
+        assert!(matches!(result, Cow::Borrowed(_)));
         assert_eq!(result, svg_without_import);
     }
 }
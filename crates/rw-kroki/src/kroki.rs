@@ -239,8 +239,12 @@ fn render_one_png_data_uri(
         return Err(diagram.error(DiagramErrorKind::InvalidPng));
     }
 
-    let base64 = BASE64_STANDARD.encode(&data);
-    let data_uri = format!("{PNG_DATA_URI_PREFIX}{base64}");
+    // Encode straight after the prefix rather than formatting an encoded
+    // copy into a second string: PNGs are the largest thing Kroki returns.
+    let encoded_len = base64::encoded_len(data.len(), true).unwrap_or(0);
+    let mut data_uri = String::with_capacity(PNG_DATA_URI_PREFIX.len() + encoded_len);
+    data_uri.push_str(PNG_DATA_URI_PREFIX);
+    BASE64_STANDARD.encode_string(&data, &mut data_uri);
 
     Ok(RenderedPngDataUri {
         index: diagram.index,
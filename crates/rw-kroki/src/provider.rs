@@ -18,6 +18,7 @@
 //! assert!(!provider.handles("rust"));
 //! ```
 
+use std::collections::HashMap;
 use std::path::PathBuf;
 use std::time::Duration;
 
@@ -123,6 +124,7 @@ impl KrokiProvider {
         }
 
         let outcome = render_all_svg_partial(jobs, &self.kroki_url, &self.agent);
+        let mut svgs = Vec::with_capacity(outcome.rendered.len());
         for rendered in outcome.rendered {
             let Some(miss) = take_miss(misses, rendered.index) else {
                 continue;
@@ -132,11 +134,18 @@ impl KrokiProvider {
             // what a consumer embeds is already display-sized.
             let stripped = strip_google_fonts_import(rendered.svg.trim());
             let (scaled, _size) = scale_svg_dimensions(&stripped, rendered.language.render_dpi());
-            self.cache.set_string(&miss.hash, "", &scaled);
+            svgs.push((rendered.index, miss, scaled));
+        }
+        let entries: Vec<(&str, &str, &[u8])> = svgs
+            .iter()
+            .map(|(_, miss, scaled)| (miss.hash.as_str(), "", scaled.as_bytes()))
+            .collect();
+        self.cache.set_many(&entries);
 
+        for (index, miss, scaled) in svgs {
             fill(
                 results,
-                rendered.index,
+                index,
                 Ok(Resolved {
                     asset: Asset::Inline(DiagramContent::Svg(scaled)),
                     // An SVG carries its own width and height, so there is
@@ -158,11 +167,20 @@ impl KrokiProvider {
         }
 
         let outcome = render_all_png_data_uri_partial(jobs, &self.kroki_url, &self.agent);
+        let mut pngs = Vec::with_capacity(outcome.rendered.len());
         for rendered in outcome.rendered {
             let Some(miss) = take_miss(misses, rendered.index) else {
                 continue;
             };
-            self.cache.set_string(&miss.hash, "", &rendered.data_uri);
+            pngs.push((miss, rendered));
+        }
+        let entries: Vec<(&str, &str, &[u8])> = pngs
+            .iter()
+            .map(|(miss, rendered)| (miss.hash.as_str(), "", rendered.data_uri.as_bytes()))
+            .collect();
+        self.cache.set_many(&entries);
+
+        for (miss, rendered) in pngs {
             fill(
                 results,
                 rendered.index,
@@ -187,6 +205,11 @@ impl DiagramProvider for KrokiProvider {
         let mut misses: Vec<Option<Miss>> = (0..requests.len()).map(|_| None).collect();
         let mut svg_jobs = Vec::new();
         let mut png_jobs = Vec::new();
+        // First position each digest was seen at. A repeat of a diagram
+        // earlier in the batch (a snippet pasted into several fences) takes
+        // that one's answer instead of another cache read and Kroki request.
+        let mut first_seen: HashMap<String, usize> = HashMap::new();
+        let mut repeats = Vec::new();
 
         for (position, request) in requests.iter().enumerate() {
             let Some(language) = DiagramLanguage::parse(&request.language) else {
@@ -226,6 +249,12 @@ impl DiagramProvider for KrokiProvider {
             let hash = DiagramKey::for_render(&source, language, format).compute_hash();
             let miss = Miss { hash, warnings };
 
+            if let Some(&first) = first_seen.get(&miss.hash) {
+                repeats.push((position, first, miss));
+                continue;
+            }
+            first_seen.insert(miss.hash.clone(), position);
+
             if let Some(content) = self.cache.get_string(&miss.hash, "") {
                 fill(
                     &mut results,
@@ -248,6 +277,7 @@ impl DiagramProvider for KrokiProvider {
         // request held, which is what the batch below is indexed by.
         self.render_svg(&svg_jobs, &mut misses, &mut results);
         self.render_png(&png_jobs, &mut misses, &mut results);
+        answer_repeats(repeats, &mut results);
 
         results
             .into_iter()
@@ -305,6 +335,25 @@ fn take_miss(misses: &mut [Option<Miss>], position: usize) -> Option<Miss> {
     misses.get_mut(position)?.take()
 }
 
+/// Answer each repeated diagram from the first request with the same digest.
+///
+/// The digest fixes the rendered bytes, so the content (or the failure) is
+/// shared; the warnings are the repeat's own, since they come from its
+/// attributes and source preparation, not the render.
+fn answer_repeats(repeats: Vec<(usize, usize, Miss)>, results: &mut [Slot]) {
+    for (position, first, miss) in repeats {
+        let Some(Some(answer)) = results.get(first).cloned() else {
+            continue;
+        };
+        let result = answer.map(|resolved| Resolved {
+            digest: miss.hash,
+            warnings: miss.warnings,
+            ..resolved
+        });
+        fill(results, position, result);
+    }
+}
+
 /// Report each render failure against the request it belongs to.
 fn record_errors(errors: Vec<KrokiError>, results: &mut [Slot]) {
     for error in errors {
@@ -1507,6 +1556,34 @@ mod tests {
         );
     }
 
+    #[test]
+    fn a_diagram_repeated_in_a_batch_is_rendered_once() {
+        let stub = KrokiStub::start();
+        let source = "graph TD; A-->B";
+
+        let provider = KrokiProvider::new(&stub.url);
+        let results = provider.resolve(
+            &[
+                request(0, "mermaid", source),
+                request(1, "mermaid", "graph TD; C-->D"),
+                with_attr(request(2, "mermaid", source), "theme", "dark"),
+            ],
+            &ResolveContext::default(),
+        );
+
+        assert_eq!(stub.paths(), ["/mermaid/svg", "/mermaid/svg"]);
+        let first = results[0].as_ref().expect("rendered");
+        let repeat = results[2].as_ref().expect("answered from the first render");
+        assert_eq!(svg_of(repeat), svg_of(first));
+        assert_eq!(repeat.digest, first.digest);
+        // Warnings stay with the request that raised them.
+        assert!(first.warnings.is_empty());
+        assert_eq!(
+            repeat.warnings,
+            ["unknown attribute 'theme' ignored (valid: format)"]
+        );
+    }
+
     #[test]
     fn a_batch_returns_one_result_per_request_in_order() {
         let stub = KrokiStub::start();
@@ -6,7 +6,7 @@ use std::sync::{Arc, OnceLock};
 
 use napi::Result;
 use napi_derive::napi;
-use rw_cache::{Cache, NullCache};
+use rw_cache::{Cache, MemoryBudget, MemoryCache, NullCache};
 use rw_cache_s3::S3Cache;
 use rw_config::Config;
 use rw_site::{
@@ -37,6 +37,15 @@ fn shared_runtime() -> Arc<tokio::runtime::Runtime> {
     }))
 }
 
+/// Memory budget shared by the caches of all S3-backed sites.
+///
+/// Created on first use and lives for the process lifetime. A site is created
+/// per entity, so a budget per site would grow with the number of entities.
+fn shared_memory_budget() -> &'static MemoryBudget {
+    static BUDGET: OnceLock<MemoryBudget> = OnceLock::new();
+    BUDGET.get_or_init(|| MemoryBudget::new(MemoryCache::DEFAULT_MAX_BYTES))
+}
+
 /// Format an error with its full source chain.
 fn error_chain(err: &dyn std::error::Error) -> String {
     let mut msg = err.to_string();
@@ -138,11 +147,19 @@ pub fn create_site(config: SiteConfig) -> Result<RwSite> {
                 ))
             })?;
 
-            let cache: Arc<dyn Cache> = Arc::new(S3Cache::new(
-                storage.client().clone(),
-                storage.runtime_handle(),
-                storage.config().bucket.clone(),
-                storage.config().base_prefix(),
+            // Recently used entries stay in memory, so a page or diagram read
+            // again (a diagram shared by several pages, say) is not fetched
+            // from S3 again while it is held. All sites share one budget of
+            // MemoryCache::DEFAULT_MAX_BYTES (64 MiB), whatever the number of
+            // entities.
+            let cache: Arc<dyn Cache> = Arc::new(MemoryCache::with_budget(
+                S3Cache::new(
+                    storage.client().clone(),
+                    storage.runtime_handle(),
+                    storage.config().bucket.clone(),
+                    storage.config().base_prefix(),
+                ),
+                shared_memory_budget(),
             ));
 
             let mut renderer_config = PageRendererConfig::default();
@@ -230,9 +230,14 @@ pub async fn run_server(
         &config.meta_filename,
     ));
 
-    // Construct cache
+    // Construct cache: the file cache behind recently used entries held in
+    // memory, so re-opening a page does not re-read it from disk. At most
+    // MemoryCache::DEFAULT_MAX_BYTES (64 MiB) in total, shared by all buckets
     let cache: Arc<dyn rw_cache::Cache> = match &config.cache_dir {
-        Some(dir) => Arc::new(rw_cache::FileCache::new(dir.clone(), &config.version)),
+        Some(dir) => Arc::new(rw_cache::MemoryCache::new(
+            rw_cache::FileCache::new(dir.clone(), &config.version),
+            rw_cache::MemoryCache::DEFAULT_MAX_BYTES,
+        )),
         None => Arc::new(rw_cache::NullCache),
     };
 
@@ -77,6 +77,13 @@ pub struct PageRendererConfig {
 /// markdown content have [`has_content`](Self::has_content) set to `true`;
 /// [virtual pages](crate#virtual-pages) (directories without `index.md`)
 /// have it set to `false`.
+///
+/// The structure cache (`CachedSiteState`) stores pages as columns, one array
+/// per field: `PageColumnsRef` writes them, and `PageColumns` and
+/// `ColumnarPages` read them back. `Page`'s own serde form is read only for
+/// entries cached in the older page-list form. A new field must be added to
+/// `PageColumnsRef`, `PageColumns` and `ColumnarPages` too, or it silently
+/// disappears on a cache round-trip.
 #[derive(Debug, Default, PartialEq, Eq, Serialize, Deserialize)]
 pub struct Page {
     /// Display title, resolved from (in priority order): frontmatter `title`,
@@ -95,9 +102,8 @@ pub struct Page {
     pub description: Option<String>,
     /// Declared page kind (`"domain"`, `"guide"`, …), resolved from frontmatter
     /// or `meta.yaml`. `Some` exactly when this page registers a section.
-    /// `Page` is persisted in the structure cache (`CachedSiteState`); being
-    /// `Option` lets an entry cached before this field existed deserialize as
-    /// kindless rather than failing.
+    /// Being `Option` lets a structure-cache entry written before this field
+    /// existed deserialize as kindless rather than failing.
     #[serde(default, skip_serializing_if = "Option::is_none")]
     #[allow(clippy::struct_field_names)]
     pub page_kind: Option<String>,
@@ -118,10 +124,10 @@ pub struct Page {
     pub is_dir: bool,
 }
 
-/// Serde default for [`Page::is_dir`]. `Page` is persisted in the
-/// structure cache (`CachedSiteState`), so an entry cached before this field
-/// existed must still deserialize; such a site had no leaf pages, so
-/// directory-style resolution preserves the links it was cached with.
+/// Serde default for [`Page::is_dir`]. The structure cache (`CachedSiteState`)
+/// still reads pages in the older page-list form, so an entry cached before
+/// this field existed must still deserialize; such a site had no leaf pages,
+/// so directory-style resolution preserves the links it was cached with.
 fn default_is_dir() -> bool {
     true
 }
@@ -1038,7 +1038,7 @@ impl SiteStateBuilder {
 /// reload) to avoid a serialized value desyncing from the data.
 #[derive(Serialize)]
 struct CachedSiteStateRef<'a> {
-    pages: &'a [Page],
+    page_columns: PageColumnsRef<'a>,
     children: &'a [Vec<usize>],
     parents: &'a [Option<usize>],
     roots: &'a [usize],
@@ -1049,7 +1049,7 @@ struct CachedSiteStateRef<'a> {
 impl<'a> From<&'a SiteState> for CachedSiteStateRef<'a> {
     fn from(state: &'a SiteState) -> Self {
         Self {
-            pages: &state.pages,
+            page_columns: PageColumnsRef::from(state.pages.as_slice()),
             children: &state.children,
             parents: &state.parents,
             roots: &state.roots,
@@ -1060,18 +1060,58 @@ impl<'a> From<&'a SiteState> for CachedSiteStateRef<'a> {
 }
 
 /// Cache format for site state deserialization (owned).
+///
+/// Pages come from exactly one of the two encodings [`CachedSiteStateFields`]
+/// accepts, so an entry carrying neither is a miss rather than an empty site.
 #[derive(Deserialize)]
+#[serde(try_from = "CachedSiteStateFields")]
 struct CachedSiteState {
     pages: Vec<Page>,
     children: Vec<Vec<usize>>,
     parents: Vec<Option<usize>>,
     roots: Vec<usize>,
+    sections: HashMap<String, Section>,
+    root_namespace: Namespace,
+}
+
+/// Fields of a cached site state entry as written.
+#[derive(Deserialize)]
+struct CachedSiteStateFields {
+    /// Row-oriented pages, present only in entries written before
+    /// `page_columns` existed. Still read so an upgrade without a
+    /// cache-version bump loads the cache instead of forcing a full scan.
+    pages: Option<Vec<Page>>,
+    page_columns: Option<ColumnarPages>,
+    children: Vec<Vec<usize>>,
+    parents: Vec<Option<usize>>,
+    roots: Vec<usize>,
     #[serde(default)]
     sections: HashMap<String, Section>,
     #[serde(default)]
     root_namespace: Namespace,
 }
 
+impl TryFrom<CachedSiteStateFields> for CachedSiteState {
+    type Error = &'static str;
+
+    fn try_from(fields: CachedSiteStateFields) -> Result<Self, Self::Error> {
+        let pages = match (fields.pages, fields.page_columns) {
+            (Some(pages), None) => pages,
+            (None, Some(columns)) => columns.0,
+            (None, None) => return Err("cached site state has no pages"),
+            (Some(_), Some(_)) => return Err("cached site state has pages in two encodings"),
+        };
+        Ok(Self {
+            pages,
+            children: fields.children,
+            parents: fields.parents,
+            roots: fields.roots,
+            sections: fields.sections,
+            root_namespace: fields.root_namespace,
+        })
+    }
+}
+
 impl From<CachedSiteState> for SiteState {
     fn from(cached: CachedSiteState) -> Self {
         SiteState::new(
@@ -1085,6 +1125,114 @@ impl From<CachedSiteState> for SiteState {
     }
 }
 
+/// Column-oriented (struct-of-arrays) view of the page list for the
+/// structure cache.
+///
+/// Each [`Page`] field becomes one array indexed like `SiteState::pages`, so
+/// the encoded JSON names every field once instead of once per page, and the
+/// mostly-empty optional fields collapse to nothing when no page sets them.
+#[derive(Serialize)]
+struct PageColumnsRef<'a> {
+    titles: Vec<&'a str>,
+    paths: Vec<&'a str>,
+    has_content: Vec<bool>,
+    #[serde(skip_serializing_if = "all_none")]
+    descriptions: Vec<Option<&'a str>>,
+    #[serde(skip_serializing_if = "all_none")]
+    page_kinds: Vec<Option<&'a str>>,
+    #[serde(skip_serializing_if = "all_none")]
+    origins: Vec<Option<&'a str>>,
+    #[serde(skip_serializing_if = "all_none")]
+    page_orders: Vec<Option<&'a [String]>>,
+    is_dir: Vec<bool>,
+}
+
+fn all_none<T>(column: &[Option<T>]) -> bool {
+    column.iter().all(Option::is_none)
+}
+
+impl<'a> From<&'a [Page]> for PageColumnsRef<'a> {
+    fn from(pages: &'a [Page]) -> Self {
+        Self {
+            titles: pages.iter().map(|p| p.title.as_str()).collect(),
+            paths: pages.iter().map(|p| p.path.as_str()).collect(),
+            has_content: pages.iter().map(|p| p.has_content).collect(),
+            descriptions: pages.iter().map(|p| p.description.as_deref()).collect(),
+            page_kinds: pages.iter().map(|p| p.page_kind.as_deref()).collect(),
+            origins: pages.iter().map(|p| p.origin.as_deref()).collect(),
+            page_orders: pages.iter().map(|p| p.pages.as_deref()).collect(),
+            is_dir: pages.iter().map(|p| p.is_dir).collect(),
+        }
+    }
+}
+
+/// Owned counterpart of [`PageColumnsRef`].
+///
+/// Optional columns may be absent (all `None`), which also lets a column added
+/// later deserialize from entries written before it existed.
+#[derive(Deserialize)]
+struct PageColumns {
+    titles: Vec<String>,
+    paths: Vec<String>,
+    has_content: Vec<bool>,
+    #[serde(default)]
+    descriptions: Vec<Option<String>>,
+    #[serde(default)]
+    page_kinds: Vec<Option<String>>,
+    #[serde(default)]
+    origins: Vec<Option<String>>,
+    #[serde(default)]
+    page_orders: Vec<Option<Vec<String>>>,
+    is_dir: Vec<bool>,
+}
+
+/// Pages rebuilt from [`PageColumns`], rejecting entries whose columns
+/// disagree in length so a corrupted cache is a miss rather than a panic.
+#[derive(Deserialize)]
+#[serde(try_from = "PageColumns")]
+struct ColumnarPages(Vec<Page>);
+
+impl TryFrom<PageColumns> for ColumnarPages {
+    type Error = &'static str;
+
+    fn try_from(columns: PageColumns) -> Result<Self, Self::Error> {
+        let len = columns.titles.len();
+        let optional_ok = |column_len: usize| column_len == len || column_len == 0;
+        if columns.paths.len() != len
+            || columns.has_content.len() != len
+            || columns.is_dir.len() != len
+            || !optional_ok(columns.descriptions.len())
+            || !optional_ok(columns.page_kinds.len())
+            || !optional_ok(columns.origins.len())
+            || !optional_ok(columns.page_orders.len())
+        {
+            return Err("page columns have mismatched lengths");
+        }
+
+        let mut descriptions = columns.descriptions.into_iter();
+        let mut page_kinds = columns.page_kinds.into_iter();
+        let mut origins = columns.origins.into_iter();
+        let mut page_orders = columns.page_orders.into_iter();
+        let pages = columns
+            .titles
+            .into_iter()
+            .zip(columns.paths)
+            .zip(columns.has_content.into_iter().zip(columns.is_dir))
+            .map(|((title, path), (has_content, is_dir))| Page {
+                title,
+                path,
+                has_content,
+                description: descriptions.next().flatten(),
+                page_kind: page_kinds.next().flatten(),
+                origin: origins.next().flatten(),
+                pages: page_orders.next().flatten(),
+                is_dir,
+            })
+            .collect();
+        Ok(Self(pages))
+    }
+}
+
 #[cfg(test)]
 mod tests {
     use super::*;
@@ -2359,6 +2507,20 @@ mod tests {
         assert_eq!(section.name, "billing");
     }
 
+    #[test]
+    fn cached_site_state_without_pages_is_rejected() {
+        // A truncated entry, or one written by a different version, must read
+        // as a cache miss. Accepting it would load a site with no pages and
+        // blank the navigation until the cache is invalidated.
+        let json = r#"{
+            "children": [],
+            "parents": [],
+            "roots": [],
+            "sections": {}
+        }"#;
+        assert!(serde_json::from_str::<CachedSiteState>(json).is_err());
+    }
+
     #[test]
     fn cached_site_state_deserializes_old_page_without_page_kind_field() {
         // Cache entries written before `Page::page_kind` existed contain pages
@@ -2380,6 +2542,63 @@ mod tests {
         assert_eq!(page.page_kind, None);
     }
 
+    #[test]
+    fn cached_site_state_page_columns_roundtrip_all_fields() {
+        let pages = vec![
+            Page {
+                title: "Home".to_owned(),
+                path: String::new(),
+                has_content: true,
+                pages: Some(vec!["billing".to_owned()]),
+                ..Page::default()
+            },
+            Page {
+                title: "Billing".to_owned(),
+                path: "billing".to_owned(),
+                has_content: false,
+                description: Some("Payments".to_owned()),
+                page_kind: Some("domain".to_owned()),
+                origin: Some("shared".to_owned()),
+                pages: None,
+                is_dir: false,
+            },
+        ];
+
+        let json = serde_json::to_string(&PageColumnsRef::from(pages.as_slice())).unwrap();
+        let ColumnarPages(decoded) = serde_json::from_str(&json).unwrap();
+
+        assert_eq!(decoded, pages);
+    }
+
+    #[test]
+    fn cached_site_state_page_columns_omit_unset_optional_columns() {
+        let pages = vec![Page {
+            title: "Guide".to_owned(),
+            path: "guide".to_owned(),
+            has_content: true,
+            is_dir: true,
+            ..Page::default()
+        }];
+
+        let json = serde_json::to_value(PageColumnsRef::from(pages.as_slice())).unwrap();
+
+        assert!(json.get("descriptions").is_none());
+        assert!(json.get("page_orders").is_none());
+        let ColumnarPages(decoded) = serde_json::from_value(json).unwrap();
+        assert_eq!(decoded, pages);
+    }
+
+    #[test]
+    fn cached_site_state_rejects_mismatched_page_columns() {
+        let json = r#"{
+            "titles": ["A", "B"],
+            "paths": ["a"],
+            "has_content": [true, true],
+            "is_dir": [true, true]
+        }"#;
+        assert!(serde_json::from_str::<ColumnarPages>(json).is_err());
+    }
+
     #[test]
     fn add_page_with_namespace_builds_namespaced_section() {
         let site = site(&[section("billing", "Billing", "domain").ns("payments".parse().unwrap())]);